@@ -0,0 +1,144 @@
+"""
+Socket-to-process mapping cost at a given socket count, on a generated fake
+procfs tree (no root needed, and the numbers don't depend on the host):
+
+    ProcNetTable cold     first refresh: every PID's fds are scanned
+    ProcNetTable steady   nothing changed since the last refresh
+    ProcNetTable churn    1% of sockets closed, and as many opened by other existing processes
+    psutil               psutil.net_connections on the same tree (full rescan every time)
+
+Usage:
+    python benchmarks/bench_proc_net.py --sockets 1000 10000 [--fds 8] [--rounds 5] [--dir /dev/shm]
+
+The tree goes on tmpfs by default: like procfs (Linux 6.2+), a tmpfs directory's
+st_size changes with its entry count, which ProcNetTable uses to spot processes
+whose fds changed. On disk filesystems the churn case degrades to a full rescan.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.proc_net import ProcNetTable
+
+_HEADER = ("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt"
+           "   uid  timeout inode\n")
+
+
+class FakeProc:
+    """A procfs-shaped directory: /net/{tcp,tcp6,udp,udp6} plus /<pid>/fd symlinks."""
+
+    def __init__(self, root, sockets, fds_per_pid, seed=0):
+        self.root = root
+        self.rnd = random.Random(seed)
+        self.next_inode = 100000
+        pids = max(1, sockets // fds_per_pid)
+        self.owners = {}  # inode -> pid
+        self.sockets = {}  # inode -> (table, line)
+        os.makedirs(os.path.join(root, "net"))
+        for pid in range(1000, 1000 + pids):
+            os.makedirs(os.path.join(root, str(pid), "fd"))
+            # Non-socket fds every real process has
+            for fd in range(3):
+                os.symlink("/dev/null", os.path.join(root, str(pid), "fd", str(fd)))
+        self.pids = list(range(1000, 1000 + pids))
+        for _ in range(sockets):
+            self.add_socket(self.rnd.choice(self.pids))
+        self.write_tables()
+
+    def add_socket(self, pid):
+        inode = self.next_inode
+        self.next_inode += 1
+        table = self.rnd.choice(("tcp", "tcp", "udp", "tcp6"))
+        port = self.rnd.randrange(1024, 65536)
+        address = "0100007F" if not table.endswith("6") else "0000000000000000FFFF00000100007F"
+        remote = "0" * len(address)
+        line = (f"{len(self.sockets):4d}: {address}:{port:04X} {remote}:0000 01 00000000:00000000 "
+                f"00:00000000 00000000  1000        0 {inode} 1 0000000000000000 20 4 0 10 -1\n")
+        self.sockets[inode] = (table, line)
+        self.owners[inode] = pid
+        os.symlink(f"socket:[{inode}]", os.path.join(self.root, str(pid), "fd", str(inode)))
+
+    def churn(self, fraction):
+        for inode in self.rnd.sample(list(self.sockets), max(1, int(len(self.sockets) * fraction))):
+            pid = self.owners.pop(inode)
+            del self.sockets[inode]
+            os.unlink(os.path.join(self.root, str(pid), "fd", str(inode)))
+            self.add_socket(self.rnd.choice(self.pids))
+        self.write_tables()
+
+    def write_tables(self):
+        lines = {"tcp": [], "tcp6": [], "udp": [], "udp6": []}
+        for table, line in self.sockets.values():
+            lines[table].append(line)
+        for table, rows in lines.items():
+            with open(os.path.join(self.root, "net", table), "w") as f:
+                f.write(_HEADER)
+                f.writelines(rows)
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+
+def run(sockets, fds_per_pid, rounds, directory=None):
+    root = tempfile.mkdtemp(prefix="fakeproc-", dir=directory)
+    try:
+        fake = FakeProc(root, sockets, fds_per_pid)
+        table = ProcNetTable(root)
+
+        cold_ms, found = timed(lambda: ProcNetTable(root).connections(), 1)
+        table.connections()
+        steady_ms, _ = timed(table.connections, rounds)
+
+        churn = []
+        for _ in range(rounds):
+            fake.churn(0.01)
+            start = time.perf_counter()
+            table.connections()
+            churn.append((time.perf_counter() - start) * 1000)
+        churn.sort()
+
+        psutil_ms = None
+        try:
+            import psutil
+            psutil.PROCFS_PATH = root
+            psutil_ms, conns = timed(lambda: psutil.net_connections(kind="inet"), rounds)
+        except Exception as e:
+            print(f"  (psutil comparison unavailable: {e})")
+
+        print(f"{sockets:>6} sockets, {len(fake.pids)} pids: resolved {len(found)}")
+        print(f"  ProcNetTable cold   {cold_ms:9.2f} ms")
+        print(f"  ProcNetTable steady {steady_ms:9.2f} ms")
+        print(f"  ProcNetTable churn  {churn[len(churn) // 2]:9.2f} ms  (1% closed, 1% opened)")
+        if psutil_ms is not None:
+            print(f"  psutil              {psutil_ms:9.2f} ms")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--fds", type=int, default=8, help="sockets per process")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--dir", default="/dev/shm" if os.path.isdir("/dev/shm") else None,
+                        help="where to build the fake tree")
+    args = parser.parse_args()
+    for sockets in args.sockets:
+        run(sockets, args.fds, args.rounds, args.dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,125 @@
+import heapq
+import math
 import time
+from core import config
 from core.database import DatabaseManager
+from core.sketch import HeavyHitters, OTHER
 from core.cloud_client import CloudClient
+from core.resolver import ReverseResolver
 
 class TrafficAggregator:
-    def __init__(self):
+    """
+    Turns per-tick flow deltas into totals, log rows and per-app rates.
+    Rates are kept only for the active set: apps seen within `idle_expiry`
+    seconds, smoothed with an EWMA (time constant `smoothing` seconds), so
+    per-tick work scales with active apps rather than every app ever seen.
+
+    With `sketch_k` > 0, log rows are limited to each app's top-k (src, dst)
+    pairs per tick plus one "*" row for the remainder, and top talkers per app
+    are tracked over a window in fixed memory (see core.sketch).
+
+    Remote addresses are handed to a background reverse-DNS resolver each tick
+    (resolver=False disables it); names it finds are stored in the database.
+    """
+
+    def __init__(self, db=None, cloud=None, idle_expiry=30.0, smoothing=2.0, sketch_k=None, resolver=None):
         self.last_check_time = time.time()
-        self.db = DatabaseManager()
+        self.db = db if db is not None else DatabaseManager()
         self.global_totals = self.db.load_traffic()
+        self.dirty_apps = set()  # Apps whose totals changed since the last save
+        self.idle_expiry = idle_expiry
+        self.smoothing = smoothing
+        self.active = {}  # app_name -> [down_kbps, up_kbps, last_seen]
+        self.expired = []  # Apps dropped from the active set on the last tick
+
+        self.sketch_k = config.SKETCH_TOP_K if sketch_k is None else sketch_k
+        self.talkers = {}  # "dst_ip" / "src_ip" / "dport" -> HeavyHitters grouped by app
+        self.sketch_stats = {}  # Rows logged vs. folded into "*" on the last tick
+        if self.sketch_k > 0:
+            self._reset_talkers(time.time())
         
+        if resolver is None and config.RESOLVE_HOSTNAMES:
+            resolver = ReverseResolver(workers=config.RESOLVER_WORKERS, ttl=config.RESOLVER_TTL,
+                                       negative_ttl=config.RESOLVER_NEGATIVE_TTL)
+        self.resolver = resolver or None
+
         # Initialize Cloud Client (starts in logged-out state)
-        self.cloud = CloudClient()
+        self.cloud = cloud if cloud is not None else CloudClient()
 
-    def calculate_rates(self, fresh_traffic_data):
+    def calculate_rates(self, flow_deltas):
+        """
+        Takes the sniffer's flow deltas, (proto, src_ip, sport, dst_ip, dport,
+        app_name, down_bytes, up_bytes, packets) tuples, and returns
+        {app: [down_kbps, up_kbps]} for the active apps only.
+        """
         now = time.time()
         elapsed = now - self.last_check_time
         if elapsed < 0.1: elapsed = 0.1
         self.last_check_time = now
+
+        tick_bytes = {}  # app_name -> [down, up]
+        by_hosts = {}  # (app_name, src_ip, dst_ip) -> [down, up]; ports are merged for the logs
+        by_port = {}  # (app_name, dport) -> [down, up], only with sketches on
+        sketching = self.sketch_k > 0
         
-        current_rates_ui = {app: [0.0, 0.0] for app in self.global_totals.keys()}
-        log_entries = []
-        
-        for (app_name, src_ip, dst_ip), (new_down, new_up) in fresh_traffic_data.items():
+        for _proto, src_ip, _sport, dst_ip, dport, app_name, new_down, new_up, _packets in flow_deltas:
             # --- FILTER: Hide ICMP/Ping from Dashboard & Logs ---
             if app_name == "System (ICMP/Ping)":
                 continue
             # ----------------------------------------------------
 
-            if app_name not in self.global_totals:
-                self.global_totals[app_name] = [0, 0]
-                if app_name not in current_rates_ui:
-                    current_rates_ui[app_name] = [0.0, 0.0]
-            
-            self.global_totals[app_name][0] += new_down
-            self.global_totals[app_name][1] += new_up
-            
-            down_speed = (new_down / 1024) / elapsed
-            up_speed = (new_up / 1024) / elapsed
-            
-            current_rates_ui[app_name][0] += down_speed
-            current_rates_ui[app_name][1] += up_speed
-            
+            totals = tick_bytes.get(app_name)
+            if totals is None:
+                tick_bytes[app_name] = [new_down, new_up]
+            else:
+                totals[0] += new_down
+                totals[1] += new_up
+
+            totals = by_hosts.get((app_name, src_ip, dst_ip))
+            if totals is None:
+                by_hosts[(app_name, src_ip, dst_ip)] = [new_down, new_up]
+            else:
+                totals[0] += new_down
+                totals[1] += new_up
+
+            if sketching:
+                totals = by_port.get((app_name, dport))
+                if totals is None:
+                    by_port[(app_name, dport)] = [new_down, new_up]
+                else:
+                    totals[0] += new_down
+                    totals[1] += new_up
+
+        tick_rates = {}
+        for app_name, (new_down, new_up) in tick_bytes.items():
+            totals = self.global_totals.get(app_name)
+            if totals is None:
+                totals = self.global_totals[app_name] = [0, 0]
+            totals[0] += new_down
+            totals[1] += new_up
+            self.dirty_apps.add(app_name)
+            tick_rates[app_name] = [(new_down / 1024) / elapsed, (new_up / 1024) / elapsed]
+
+        if self.resolver is not None:
+            # Never blocks: cache misses are queued on the resolver's own threads
+            self.resolver.submit({ip for _app, src_ip, dst_ip in by_hosts for ip in (src_ip, dst_ip)})
+            self.db.save_hostnames(self.resolver.drain_resolved())
+
+        if sketching:
+            self._add_talkers(by_hosts, by_port, now)
+            by_hosts = self._heavy_hitters(by_hosts)
+
+        log_entries = []
+        for (app_name, src_ip, dst_ip), (new_down, new_up) in by_hosts.items():
             if new_down > 0 or new_up > 0:
-                # Format: (ts, app, down_spd, up_spd, src, dst)
+                # Format: (ts, app, down_spd, up_spd, src, dst, down_bytes, up_bytes)
                 log_entries.append((
-                    now, app_name, down_speed, up_speed, src_ip, dst_ip
+                    now, app_name, (new_down / 1024) / elapsed, (new_up / 1024) / elapsed,
+                    src_ip, dst_ip, new_down, new_up
                 ))
 
+        current_rates_ui = self._update_active(tick_rates, now, elapsed)
+
         # 1. Save logs locally and queue for cloud upload
         if log_entries:
             self.db.log_instances(log_entries)
@@ -56,8 +130,115 @@ class TrafficAggregator:
             
         return current_rates_ui
 
+    def _update_active(self, tick_rates, now, elapsed):
+        # EWMA weight for this tick, correct for uneven tick lengths
+        alpha = 1 - math.exp(-elapsed / self.smoothing) if self.smoothing > 0 else 1.0
+        active = self.active
+        for app_name, (down, up) in tick_rates.items():
+            entry = active.get(app_name)
+            if entry is None:
+                active[app_name] = [down, up, now]
+            else:
+                entry[0] += alpha * (down - entry[0])
+                entry[1] += alpha * (up - entry[1])
+                entry[2] = now
+
+        expired = []
+        rates = {}
+        for app_name, entry in active.items():
+            if app_name not in tick_rates:
+                # Idle this tick: decay towards zero, and drop once idle long enough
+                if now - entry[2] >= self.idle_expiry:
+                    expired.append(app_name)
+                    continue
+                entry[0] -= alpha * entry[0]
+                entry[1] -= alpha * entry[1]
+            rates[app_name] = [entry[0], entry[1]]
+        for app_name in expired:
+            del active[app_name]
+        self.expired = expired
+        return rates
+
+    def _heavy_hitters(self, by_hosts):
+        # Each app's k largest (src, dst) pairs this tick, plus one "*" row for the rest.
+        # The tick's pairs are bounded by the flow table, so this selection is exact.
+        per_app = {}
+        for key, totals in by_hosts.items():
+            per_app.setdefault(key[0], []).append((key, totals))
+        kept = {}
+        for app_name, pairs in per_app.items():
+            if len(pairs) <= self.sketch_k:
+                kept.update(pairs)
+                continue
+            pairs.sort(key=lambda pair: pair[1][0] + pair[1][1], reverse=True)
+            kept.update(pairs[:self.sketch_k])
+            rest = pairs[self.sketch_k:]
+            kept[(app_name, OTHER, OTHER)] = [sum(t[0] for _, t in rest), sum(t[1] for _, t in rest)]
+        self.sketch_stats = {"pairs": len(by_hosts), "rows": len(kept)}
+        return kept
+
+    def _add_talkers(self, by_hosts, by_port, now):
+        if now - self.talkers_started >= config.SKETCH_WINDOW:
+            self._reset_talkers(now)
+        dst_talkers = self.talkers["dst_ip"]
+        src_talkers = self.talkers["src_ip"]
+        for (app_name, src_ip, dst_ip), (down, up) in by_hosts.items():
+            dst_talkers.add(app_name, dst_ip, down, up)
+            src_talkers.add(app_name, src_ip, down, up)
+        port_talkers = self.talkers["dport"]
+        for (app_name, dport), (down, up) in by_port.items():
+            port_talkers.add(app_name, dport, down, up)
+
+    def _reset_talkers(self, now):
+        k = max(self.sketch_k, 10)
+        self.talkers = {kind: HeavyHitters(k, config.SKETCH_WIDTH, config.SKETCH_DEPTH)
+                        for kind in ("dst_ip", "src_ip", "dport")}
+        self.talkers_started = now
+
+    def top_talkers(self, app_name, by="dst_ip"):
+        """
+        The app's top destinations ("dst_ip"), sources ("src_ip") or destination
+        ports ("dport") in the current window: [(key, down, up, error), ...].
+        Each key's true bytes lie in [down + up, down + up + error]. Empty
+        unless sketches are enabled.
+        """
+        talkers = self.talkers.get(by)
+        return talkers.top(app_name) if talkers is not None else []
+
+    def get_sketch_stats(self):
+        """Per sketch kind: size, evictions and error bounds, plus the last tick's row reduction. Empty when disabled."""
+        if not self.talkers:
+            return {}
+        stats = {"tick": dict(self.sketch_stats)}
+        for kind, talkers in self.talkers.items():
+            stats[kind] = talkers.stats()
+        return stats
+
+    def hostnames(self, ips):
+        """{ip: hostname} for the addresses already resolved; never blocks."""
+        return self.resolver.names(ips) if self.resolver is not None else {}
+
+    def get_resolver_stats(self):
+        return self.resolver.stats() if self.resolver is not None else {}
+
+    def top_apps(self, k=10):
+        """The k active apps with the highest combined rate: [(app, down, up), ...]."""
+        best = heapq.nlargest(k, self.active.items(), key=lambda item: item[1][0] + item[1][1])
+        return [(app_name, entry[0], entry[1]) for app_name, entry in best]
+
     def save_data(self):
-        self.db.save_traffic(self.global_totals)
+        # Only changed apps; the write itself is batched on the DB writer thread
+        if not self.dirty_apps:
+            return
+        changed = {app: self.global_totals[app] for app in self.dirty_apps}
+        self.dirty_apps = set()
+        self.db.save_traffic(changed)
+
+    def get_history(self, start, end, resolution=None, app_filter=None):
+        return self.db.query_history(start, end, resolution=resolution, app_filter=app_filter)
 
     def get_logs(self, app_filter=None):
-        return self.db.fetch_logs(limit=100, app_filter=app_filter)
\ No newline at end of file
+        return self.db.fetch_logs(limit=100, app_filter=app_filter)
+
+    def search_logs(self, **filters):
+        return self.db.search_logs(**filters)
\ No newline at end of file
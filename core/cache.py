@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache with separate lifetimes for positive and negative results.
+
+    Not thread-safe: each instance is meant to be owned by a single thread
+    (e.g. the capture thread). Negative entries let callers remember
+    "nothing found" without repeating the expensive lookup.
+    """
+
+    def __init__(self, max_size=4096, ttl=10.0, negative_ttl=2.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._data = OrderedDict()  # Key -> (value, expires_at, negative)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=MISSING):
+        """Returns the cached value, or `default` if absent or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, expires_at, negative = entry
+        if self.clock() >= expires_at:
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        if negative:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value, negative=False):
+        ttl = self.negative_ttl if negative else self.ttl
+        self._data[key] = (value, self.clock() + ttl, negative)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def items(self):
+        """Live (key, value) pairs, without touching LRU order or the counters."""
+        now = self.clock()
+        return [(key, value) for key, (value, expires_at, _negative) in self._data.items() if expires_at > now]
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
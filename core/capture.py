@@ -0,0 +1,199 @@
+import ctypes
+import socket
+import struct
+import time
+from core.platform import IS_LINUX, IS_WINDOWS
+
+# Every backend reports packets as:
+#   callback(proto, src_ip, dst_ip, sport, dport, size, tcp_flags)
+# sport/dport are None for anything that is not a (first-fragment) TCP/UDP packet;
+# tcp_flags is the TCP flags byte (SYN, ACK, ...), 0 for everything else.
+
+_IPV4 = struct.Struct("!BxHxxHxB2x4s4s")  # ver/ihl, total len, flags/frag, proto, src, dst
+_IPV6 = struct.Struct("!4xHB x16s16s")    # payload len, next header, src, dst
+_PORTS = struct.Struct("!HH")
+_TCP = struct.Struct("!HH8xxB")              # ports, flags byte
+
+_inet_ntoa = socket.inet_ntoa
+_inet_ntop = socket.inet_ntop
+_AF_INET6 = socket.AF_INET6
+
+
+def parse_ip_packet(buf, offset=0):
+    """
+    Reads only the fixed IPv4/IPv6 and TCP/UDP header fields, straight out of `buf`.
+    Returns (proto, src_ip, dst_ip, sport, dport, size, tcp_flags) or None if it isn't IP.
+    """
+    try:
+        version = buf[offset] >> 4
+        if version == 4:
+            ver_ihl, size, frag, proto, src, dst = _IPV4.unpack_from(buf, offset)
+            sport = dport = None
+            flags = 0
+            if (proto == 6 or proto == 17) and not (frag & 0x1FFF):
+                try:
+                    if proto == 6:
+                        sport, dport, flags = _TCP.unpack_from(buf, offset + (ver_ihl & 0x0F) * 4)
+                    else:
+                        sport, dport = _PORTS.unpack_from(buf, offset + (ver_ihl & 0x0F) * 4)
+                except struct.error:
+                    pass
+            return proto, _inet_ntoa(src), _inet_ntoa(dst), sport, dport, size, flags
+        if version == 6:
+            payload_len, proto, src, dst = _IPV6.unpack_from(buf, offset)
+            sport = dport = None
+            flags = 0
+            # Extension headers are not walked; such packets are reported by next-header id
+            if proto == 6 or proto == 17:
+                try:
+                    if proto == 6:
+                        sport, dport, flags = _TCP.unpack_from(buf, offset + 40)
+                    else:
+                        sport, dport = _PORTS.unpack_from(buf, offset + 40)
+                except struct.error:
+                    pass
+            return proto, _inet_ntop(_AF_INET6, src), _inet_ntop(_AF_INET6, dst), sport, dport, payload_len + 40, flags
+    except (IndexError, struct.error):
+        pass
+    return None
+
+
+class CaptureBackend:
+    """Base class: `capture` blocks for up to `timeout` seconds delivering packets."""
+    name = "base"
+
+    def capture(self, callback, timeout=1.0):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ScapyBackend(CaptureBackend):
+    """Portable backend built on scapy's sniff() (libpcap / Npcap). Sizes include the link header."""
+    name = "scapy"
+
+    def __init__(self):
+        from scapy.all import sniff, IP, IPv6, TCP, UDP
+        if IS_WINDOWS:
+            from scapy.all import conf
+            conf.use_pcap = True
+        self._sniff = sniff
+        self._layers = (IP, IPv6, TCP, UDP)
+
+    def capture(self, callback, timeout=1.0):
+        IP, IPv6, TCP, UDP = self._layers
+
+        def on_packet(pkt):
+            if IP in pkt:
+                l3 = pkt[IP]
+                proto = l3.proto
+            elif IPv6 in pkt:
+                l3 = pkt[IPv6]
+                proto = l3.nh
+            else:
+                return
+
+            sport = dport = None
+            flags = 0
+            if TCP in pkt:
+                proto, sport, dport = 6, pkt[TCP].sport, pkt[TCP].dport
+                flags = int(pkt[TCP].flags)
+            elif UDP in pkt:
+                proto, sport, dport = 17, pkt[UDP].sport, pkt[UDP].dport
+            callback(proto, l3.src, l3.dst, sport, dport, len(pkt), flags)
+
+        self._sniff(prn=on_packet, store=False, timeout=timeout)
+
+
+class AfPacketBackend(CaptureBackend):
+    """
+    Linux raw-socket backend. A classic BPF program attached in the kernel drops
+    non-IP frames and truncates the rest to `snaplen`, and headers are parsed in
+    place from a reused buffer. Sizes are IP datagram lengths (no link header).
+    """
+    name = "afpacket"
+
+    ETH_P_ALL = 0x0003
+    SO_ATTACH_FILTER = 26
+    SKF_AD_PROTOCOL = 0xFFFFF000  # SKF_AD_OFF + SKF_AD_PROTOCOL: the frame's ethertype
+
+    def __init__(self, snaplen=128, rcvbuf=4 * 1024 * 1024):
+        if not IS_LINUX or not hasattr(socket, "AF_PACKET"):
+            raise OSError("AF_PACKET capture is only available on Linux")
+        self.snaplen = snaplen
+        self.rcvbuf = rcvbuf
+        self.sock = None
+        self._buf = bytearray(snaplen)
+        self._filter = None
+
+    def _bpf_program(self):
+        return [
+            (0x28, 0, 0, self.SKF_AD_PROTOCOL),  # ldh ethertype
+            (0x15, 2, 0, 0x0800),                # jeq IPv4 -> accept
+            (0x15, 1, 0, 0x86DD),                # jeq IPv6 -> accept
+            (0x06, 0, 0, 0),                     # ret 0 (drop)
+            (0x06, 0, 0, self.snaplen),          # ret snaplen
+        ]
+
+    def open(self):
+        # SOCK_DGRAM strips the link-layer header, so the buffer starts at the IP header
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_DGRAM, socket.htons(self.ETH_P_ALL))
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        except OSError:
+            pass
+
+        program = self._bpf_program()
+        self._filter = ctypes.create_string_buffer(b"".join(struct.pack("HBBI", *ins) for ins in program))
+        fprog = struct.pack("HL", len(program), ctypes.addressof(self._filter))
+        sock.setsockopt(socket.SOL_SOCKET, self.SO_ATTACH_FILTER, fprog)
+        self.sock = sock
+
+    def capture(self, callback, timeout=1.0):
+        if self.sock is None:
+            self.open()
+        sock = self.sock
+        buf = self._buf
+        recv_into = sock.recv_into
+        parse = parse_ip_packet
+        deadline = time.monotonic() + timeout
+        sock.settimeout(timeout)
+
+        while True:
+            try:
+                if not recv_into(buf):
+                    continue
+            except socket.timeout:
+                return
+            rec = parse(buf)
+            if rec is not None:
+                callback(*rec)
+            if time.monotonic() >= deadline:
+                return
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def get_backend(name="auto"):
+    """Builds a capture backend by name; "auto" prefers AF_PACKET and falls back to scapy."""
+    if name == "scapy":
+        return ScapyBackend()
+    if name == "afpacket":
+        backend = AfPacketBackend()
+        backend.open()
+        return backend
+    if name != "auto":
+        raise ValueError(f"Unknown capture backend: {name}")
+
+    if IS_LINUX:
+        try:
+            backend = AfPacketBackend()
+            backend.open()
+            return backend
+        except OSError as e:
+            print(f"AF_PACKET capture unavailable ({e}), using scapy")
+    return ScapyBackend()
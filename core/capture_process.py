@@ -0,0 +1,90 @@
+import multiprocessing
+import queue
+from core.shm_ring import ShmRing
+
+
+def _capture_main(ring_name, stop_event, interval, rtt_queue):
+    # Runs in the child process: capture + attribution, publishing per-interval deltas
+    from core.packet_sniffer import PacketSniffer
+
+    ring = ShmRing.attach(ring_name)
+    sniffer = PacketSniffer()
+    sniffer.start()
+    try:
+        while not stop_event.wait(interval):
+            data = sniffer.get_traffic_data()
+            if data:
+                ring.push_many(data)
+            # Handshake RTTs are one per connection, few enough for a plain queue
+            rtt = sniffer.get_rtt_samples()
+            if rtt:
+                try:
+                    rtt_queue.put_nowait(rtt)
+                except queue.Full:
+                    pass
+    finally:
+        sniffer.stop()
+        ring.close()
+
+
+class ProcessSniffer:
+    """
+    Runs PacketSniffer in a separate process so capture and attribution don't
+    share the GIL with aggregation and the UI. Exposes the same
+    start/stop/get_traffic_data interface, fed from a shared-memory ring buffer.
+    """
+
+    def __init__(self, capacity=65536, interval=0.25):
+        self.capacity = capacity
+        self.interval = interval
+        self.ring = None
+        self.process = None
+        self.running = False
+        # "spawn" keeps the GUI's threads and GL state out of the child
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop_event = self._ctx.Event()
+        self._rtt_queue = self._ctx.Queue(maxsize=256)
+
+    def start(self):
+        self.running = True
+        self.ring = ShmRing.create(self.capacity)
+        self.process = self._ctx.Process(
+            target=_capture_main, args=(self.ring.name, self._stop_event, self.interval, self._rtt_queue), daemon=True
+        )
+        self.process.start()
+
+    def stop(self):
+        self.running = False
+        self._stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout=3)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def get_traffic_data(self):
+        # The aggregator sums per app, so repeated deltas for one flow can be passed through as-is
+        if self.ring is None:
+            return []
+        return self.ring.pop_all()
+
+    def get_rtt_samples(self):
+        samples = []
+        while True:
+            try:
+                samples.extend(self._rtt_queue.get_nowait())
+            except queue.Empty:
+                return samples
+
+    def get_ring_stats(self):
+        if self.ring is None:
+            return {}
+        stats = self.ring.stats()
+        stats["alive"] = self.process is not None and self.process.is_alive()
+        return stats
+
+    def get_capture_stats(self):
+        # Drain, flow and port-cache counters live in the capture process; the ring is what's visible here
+        return {"ring": self.get_ring_stats()}
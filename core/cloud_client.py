@@ -1,24 +1,112 @@
-import threading, requests, time
+import gzip, json, random, threading, requests, time
+from requests.adapters import HTTPAdapter
+from core import config
+from core.outbox import Outbox
 from core.system_control import kill_process_by_name
 
-BASE_URL = "http://127.0.0.1:5000/api"
+BASE_URL = config.CLOUD_URL
+
+# Column order of the log tuples produced by TrafficAggregator.calculate_rates
+LOG_COLUMNS = ["timestamp", "app_name", "download_speed", "upload_speed",
+               "src_ip", "dst_ip", "download_bytes", "upload_bytes"]
+
+# Adaptive batching: small, lazy batches when idle; larger, back-to-back ones under backlog
+MIN_BATCH, MAX_BATCH = 500, 20000
+MIN_INTERVAL, MAX_INTERVAL = 0.5, 2.0
+# Retry delay after consecutive failures: BACKOFF_BASE * 2^n capped at BACKOFF_MAX, with jitter
+BACKOFF_BASE, BACKOFF_MAX = 1.0, 300.0
+# Per sync POST; the collector answers within SYNC_WRITE_TIMEOUT (5 s), strictly less
+REQUEST_TIMEOUT = 10.0
+# How often the worker moves rows handed over by add_logs() into the outbox, whatever the send schedule
+SPOOL_INTERVAL = 0.5
+
+
+def encode_payload(rows, status, agent_id=None, ids=None):
+    """
+    JSON with one list per column (repeated names and IPs compress far better than row dicts), gzip'd.
+    `ids` are the rows' outbox ids: the collector uses them to store each row once however often
+    a batch is resent, and in whatever size.
+    """
+    columns = [list(col) for col in zip(*rows)] if rows else [[] for _ in LOG_COLUMNS]
+    first_id, last_id = (ids[0], ids[-1]) if ids else (None, None)
+    body = json.dumps({"format": "columnar", "columns": LOG_COLUMNS, "data": columns, "status": status,
+                       "agent_id": agent_id, "ids": ids or None, "first_id": first_id, "last_id": last_id,
+                       "batch_id": last_id}, separators=(",", ":")).encode()
+    return body, gzip.compress(body, compresslevel=6)
+
+
+class TokenBucket:
+    """Upload budget in bytes/sec. consume() returns how long to wait before sending."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.clock = clock
+        self.updated = clock()
+
+    def consume(self, amount):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Oversized sends are allowed but leave the bucket in debt
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
 
 class CloudClient:
-    def __init__(self):
-        self.queue = []
+    def __init__(self, base_url=None, outbox=None, max_bytes_per_sec=None):
+        self.base_url = base_url or BASE_URL
+        # Durable: rows survive crashes and restarts until the server acknowledges them
+        self.outbox = outbox if outbox is not None else Outbox(config.CLOUD_OUTBOX, config.CLOUD_MAX_QUEUE_ROWS)
+        self.bucket = TokenBucket(max_bytes_per_sec or config.CLOUD_MAX_BYTES_PER_SEC)
         self.latest_status = []
+        self.pending = []  # Row lists from add_logs(), spooled into the outbox by the worker
+        self.pending_rows = 0
         self.lock = threading.Lock()
         self.running = True
         self.token = None
-        threading.Thread(target=self._worker, daemon=True).start()
+        self.batch_size = MIN_BATCH
+        self.interval = MAX_INTERVAL
+        self.failures = 0  # Consecutive
+        self.stats = {"queued": 0, "pending_dropped": 0, "sent_rows": 0, "batches": 0, "failures": 0,
+                      "raw_bytes": 0, "wire_bytes": 0, "throttled_s": 0.0, "last_error": None}
+
+        # One pooled keep-alive connection instead of a new TCP (and TLS) handshake per POST
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
 
     def login(self, username, password):
         try:
-            r = requests.post(f"{BASE_URL}/login", json={"username": username, "password": password})
+            r = self.session.post(f"{self.base_url}/login", json={"username": username, "password": password}, timeout=5)
             if r.status_code == 200: self.token = r.json().get("access_token"); return True
         except: pass
         return False
 
+    def logout(self, discard_backlog=False):
+        """
+        Stops queueing and sending. Unsent rows stay in the outbox and are
+        uploaded after the next login, unless `discard_backlog` is set.
+        """
+        self.token = None
+        with self.lock: self.latest_status = []
+        if discard_backlog:
+            self._spool()
+            discarded = len(self.outbox)
+            self.outbox.clear()
+            print(f"Cloud sync: discarded {discarded} unsent log rows on logout")
+
+    def close(self):
+        self.running = False
+        self._stop.set()
+        self.thread.join(timeout=5)
+        self._spool()  # Rows handed over since the worker's last pass
+        self.outbox.close()
+
     def update_status(self, rates):
         """Prepares live status list: [{'name': 'Chrome', 'down': 50.0, 'up': 2.0}, ...]"""
         if not self.token: return
@@ -28,27 +116,101 @@ class CloudClient:
         with self.lock: self.latest_status = status
 
     def add_logs(self, logs):
-        if self.token:
-            with self.lock: self.queue.extend(logs)
+        # Called on the tick thread: only hands the rows over, the outbox write happens on the worker
+        if not self.token: return
+        with self.lock:
+            self.pending.append(logs)
+            self.pending_rows += len(logs)
+            self.stats["queued"] += len(logs)
+            # Bounded while the worker is held up (e.g. throttled); the outbox would drop the oldest anyway
+            while self.pending_rows > self.outbox.max_rows and len(self.pending) > 1:
+                dropped = self.pending.pop(0)
+                self.pending_rows -= len(dropped)
+                self.stats["pending_dropped"] += len(dropped)
+
+    def _spool(self):
+        with self.lock:
+            pending, self.pending, self.pending_rows = self.pending, [], 0
+        if pending:
+            self.outbox.append([row for logs in pending for row in logs])
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats.update(backlog=len(self.outbox) + self.pending_rows, dropped_rows=self.outbox.dropped,
+                         batch_size=self.batch_size,
+                         interval=self.interval, consecutive_failures=self.failures)
+        return stats
+
+    def _adapt(self, backlog):
+        # Grow the batch and send back-to-back while a backlog remains; relax when caught up
+        if backlog > 0:
+            self.batch_size = min(MAX_BATCH, self.batch_size * 2)
+            self.interval = MIN_INTERVAL
+        else:
+            self.batch_size = max(MIN_BATCH, self.batch_size // 2)
+            self.interval = min(MAX_INTERVAL, self.interval * 2)
+
+    def _backoff(self):
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** min(self.failures, 16))
+        # Equal jitter, so many agents coming back online don't retry in lockstep
+        return random.uniform(delay / 2, delay)
 
     def _worker(self):
-        while self.running:
-            time.sleep(2)
-            if not self.token: continue
-            
-            with self.lock:
-                logs_chunk = self.queue[:50]
-                del self.queue[:50]
-                current_status = self.latest_status
+        next_sync = time.monotonic() + self.interval
+        while not self._stop.wait(min(SPOOL_INTERVAL, max(0.0, next_sync - time.monotonic()))):
+            self._spool()
+            if not self.token:
+                next_sync = time.monotonic() + self.interval
+                continue
+            if time.monotonic() < next_sync: continue
+
+            ids, logs_chunk = self.outbox.peek(self.batch_size)
+            with self.lock: current_status = self.latest_status
+            body, payload = encode_payload(logs_chunk, current_status, self.outbox.agent_id, ids)
+
+            # Bandwidth cap: a long offline backlog drains at a steady rate, not in one burst
+            wait = self.bucket.consume(len(payload))
+            if wait:
+                self.stats["throttled_s"] += wait
+                if self._stop.wait(wait): break
 
+            headers = {"Authorization": f"Bearer {self.token}", "Content-Type": "application/json",
+                       "Content-Encoding": "gzip"}
             try:
-                r = requests.post(
-                    f"{BASE_URL}/sync",
-                    json={"logs": logs_chunk, "status": current_status},
-                    headers={"Authorization": f"Bearer {self.token}"}, timeout=3
-                )
-                # Execute Commands (e.g., Kill App)
-                if r.status_code == 200:
-                    for cmd in r.json().get("commands", []):
+                r = self.session.post(f"{self.base_url}/sync", data=payload, headers=headers, timeout=REQUEST_TIMEOUT)
+                error = None if r.status_code == 200 else f"HTTP {r.status_code}"
+            except Exception as e:
+                r, error = None, str(e)
+
+            if error is None:
+                # Only an accepted batch leaves the outbox
+                if ids: self.outbox.ack(ids[-1])
+                with self.lock:
+                    self.stats["sent_rows"] += len(logs_chunk)
+                    self.stats["batches"] += 1
+                    self.stats["raw_bytes"] += len(body)
+                    self.stats["wire_bytes"] += len(payload)
+                    self.failures = 0
+                    self._adapt(len(self.outbox))
+            else:
+                with self.lock:
+                    self.stats["failures"] += 1
+                    self.stats["last_error"] = error
+                    self.failures += 1
+                    self.batch_size = MIN_BATCH
+                    self.interval = self._backoff()
+            next_sync = time.monotonic() + self.interval
+
+            # Execute Commands (e.g., Kill App)
+            if error is None:
+                try:
+                    commands = r.json().get("commands", [])
+                except (ValueError, AttributeError):
+                    commands = []
+                for cmd in commands if isinstance(commands, list) else []:
+                    # One malformed command mustn't take the sync thread down with it
+                    try:
                         if cmd['action'] == 'kill': kill_process_by_name(cmd['target'])
-            except: pass
\ No newline at end of file
+                    except (KeyError, TypeError) as e:
+                        print(f"Cloud sync: ignoring malformed command {cmd!r} ({e!r})")
@@ -0,0 +1,71 @@
+import os
+
+# Runtime settings, overridable through PACKETSENTRY_* environment variables
+
+
+def _env(name, default):
+    return os.environ.get(f"PACKETSENTRY_{name}", default)
+
+
+# Packet capture backend: "auto", "scapy" or "afpacket" (Linux only)
+CAPTURE_BACKEND = _env("CAPTURE_BACKEND", "auto")
+
+# "thread" captures inside the app process; "process" runs capture in a child
+# process that hands deltas over through a shared-memory ring buffer
+CAPTURE_MODE = _env("CAPTURE_MODE", "thread")
+
+# What traffic is attributed to: "name" (one row per process name), "pid"
+# (one row per process, "chrome (1234)") or "tree" (helper processes roll up
+# into the main process running the same executable)
+ATTRIBUTION_MODE = _env("ATTRIBUTION_MODE", "name")
+
+# Flow table bounds: most tracked 5-tuple flows (beyond it, new flows are
+# counted in a per-app overflow bucket), and seconds before a flow is dropped
+# for being idle or re-attributed for being long-lived
+FLOW_MAX_ENTRIES = int(_env("FLOW_MAX_ENTRIES", "65536"))
+FLOW_IDLE_TIMEOUT = float(_env("FLOW_IDLE_TIMEOUT", "30"))
+FLOW_ACTIVE_TIMEOUT = float(_env("FLOW_ACTIVE_TIMEOUT", "300"))
+
+# Heavy-hitter sketches: when SKETCH_TOP_K > 0, each tick logs only the top-k
+# (src, dst) pairs per app plus one "*" row for the rest, and top talkers are
+# tracked per app in fixed memory over SKETCH_WINDOW seconds. 0 logs every pair.
+SKETCH_TOP_K = int(_env("SKETCH_TOP_K", "0"))
+SKETCH_WIDTH = int(_env("SKETCH_WIDTH", "2048"))
+SKETCH_DEPTH = int(_env("SKETCH_DEPTH", "4"))
+SKETCH_WINDOW = float(_env("SKETCH_WINDOW", "300"))
+
+# Reverse DNS for remote addresses, resolved in the background and stored
+# alongside the logs: "0" disables it. Names are trusted for RESOLVER_TTL
+# seconds, failures retried after RESOLVER_NEGATIVE_TTL.
+RESOLVE_HOSTNAMES = _env("RESOLVE_HOSTNAMES", "1") != "0"
+RESOLVER_WORKERS = int(_env("RESOLVER_WORKERS", "4"))
+RESOLVER_TTL = float(_env("RESOLVER_TTL", "3600"))
+RESOLVER_NEGATIVE_TTL = float(_env("RESOLVER_NEGATIVE_TTL", "300"))
+
+# Retention per storage tier, in days (0 = keep forever). Raw rows are rolled
+# up into 1-minute, 1-hour and 1-day tables before they expire.
+RETENTION_DAYS = {
+    "raw": float(_env("RETENTION_RAW_DAYS", "2")),
+    "1m": float(_env("RETENTION_1M_DAYS", "30")),
+    "1h": float(_env("RETENTION_1H_DAYS", "365")),
+    "1d": float(_env("RETENTION_1D_DAYS", "0")),
+}
+
+# Latency probe targets: comma-separated "Name=host", "Name=tcp:host:port" or
+# "Name=udp:host:port". Plain hosts use ICMP echo, falling back to a TCP
+# connect on PING_TCP_PORT when ICMP sockets aren't permitted.
+PING_TARGETS = _env(
+    "PING_TARGETS",
+    "Cloudflare (1.1.1.1)=1.1.1.1,Google (8.8.8.8)=8.8.8.8,Mumbai Server=9.9.9.9",
+)
+PING_INTERVAL = float(_env("PING_INTERVAL", "1.0"))
+PING_TIMEOUT = float(_env("PING_TIMEOUT", "1.0"))
+PING_TCP_PORT = int(_env("PING_TCP_PORT", "443"))
+
+# Cloud sync endpoint and its durable on-disk outbox
+CLOUD_URL = _env("CLOUD_URL", "http://127.0.0.1:5000/api")
+CLOUD_OUTBOX = _env("CLOUD_OUTBOX", "cloud_outbox.db")
+# Most log rows held for cloud upload; beyond it the oldest are dropped
+CLOUD_MAX_QUEUE_ROWS = int(_env("CLOUD_MAX_QUEUE_ROWS", "200000"))
+# Upload bandwidth cap (compressed bytes/sec), so catching up after a long offline period stays smooth
+CLOUD_MAX_BYTES_PER_SEC = int(_env("CLOUD_MAX_BYTES_PER_SEC", "262144"))
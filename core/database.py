@@ -1,13 +1,52 @@
+import heapq
+import queue
 import sqlite3
 import threading
+import time
+from core import config, rollups
+
+# An app filter matching more names than this is searched with one LIKE scan instead of a branch per name
+MAX_APP_BRANCHES = 16
 
 class DatabaseManager:
-    def __init__(self, db_name="traffic_history.db"):
+    """
+    SQLite storage. All writes go through a bounded queue to one writer thread,
+    which groups them into transactions by size or time. Reads use separate
+    per-thread connections, so WAL mode lets them run while the writer commits.
+    """
+
+    def __init__(self, db_name="traffic_history.db", batch_rows=2000, flush_interval=1.0, max_queue=1000,
+                 maintenance_interval=60.0):
+        self.db_name = db_name
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.maintenance_interval = maintenance_interval
+        self.retention = {tier: days * 86400 for tier, days in config.RETENTION_DAYS.items()}
         self.conn = sqlite3.connect(db_name, check_same_thread=False)
         self.cursor = self.conn.cursor()
         self.lock = threading.Lock()
+        self._configure(self.conn)
         self._create_tables()
 
+        self._local = threading.local()
+        self._readers = []  # (thread, connection)
+        self._readers_lock = threading.Lock()  # Not self.lock: a first read mustn't wait on the writer
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.stats = {"batches": 0, "rows": 0, "dropped": 0, "commit_ms_last": 0.0,
+                      "commit_ms_max": 0.0, "commit_ms_total": 0.0,
+                      "rolled_up": 0, "expired": 0, "maintenance_ms_last": 0.0}
+        self._next_maintenance = time.monotonic()
+        self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer.start()
+
+    def _configure(self, conn):
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across app crashes in WAL mode; only an OS crash can lose the last commits
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+
     def _create_tables(self):
         with self.lock:
             self.cursor.execute("""
@@ -28,50 +67,322 @@ class DatabaseManager:
                     dst_ip TEXT
                 )
             """)
+            # Reverse-DNS names for log and rollup addresses (see core.resolver)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS hostnames (
+                    ip TEXT PRIMARY KEY,
+                    hostname TEXT,
+                    resolved_at REAL
+                )
+            """)
+            rollups.ensure_schema(self.conn)
+            # Search indexes; the rowid (id) is implicitly the last column of each,
+            # which gives a (timestamp, id) order for keyset pagination
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_app ON instance_logs (app_name, timestamp)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_src ON instance_logs (src_ip, timestamp)")
+            self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_logs_dst ON instance_logs (dst_ip, timestamp)")
             self.conn.commit()
 
+    # --- Reads (per-thread connections) ---
+    def _reader(self):
+        if self.db_name == ":memory:":
+            return None  # A private in-memory DB can't be opened twice; share the writer's
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA query_only=ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                # Connections of threads that have since exited would otherwise stay open for good
+                for thread, old in self._readers:
+                    if not thread.is_alive():
+                        old.close()
+                self._readers = [(thread, old) for thread, old in self._readers if thread.is_alive()]
+                self._readers.append((threading.current_thread(), conn))
+        return conn
+
+    def _query(self, sql, params=()):
+        conn = self._reader()
+        if conn is None:
+            with self.lock:
+                return self.conn.execute(sql, params).fetchall()
+        return conn.execute(sql, params).fetchall()
+
     def load_traffic(self):
-        with self.lock:
-            self.cursor.execute("SELECT * FROM app_traffic")
-            rows = self.cursor.fetchall()
-            return {row[0]: [row[1], row[2]] for row in rows}
+        # One sequential scan of the primary key; tens of thousands of apps load in milliseconds
+        rows = self._query("SELECT app_name, download_bytes, upload_bytes FROM app_traffic")
+        return {app: [down, up] for app, down, up in rows}
+
+    def fetch_logs(self, limit=100, app_filter=None):
+        """Fetches the newest logs, optionally filtering by app_name"""
+        rows, _cursor = self.search_logs(app_filter=app_filter, limit=limit)
+        return [row[:6] for row in rows]
+
+    def match_apps(self, text):
+        """Case-insensitive substring match against every app name ever recorded."""
+        text = text.lower()
+        names = self._query("SELECT app_name FROM app_traffic")
+        return [name for (name,) in names if text in name.lower()]
+
+    def search_logs(self, app_filter=None, ip=None, start=None, end=None, cursor=None, limit=100):
+        """
+        Newest-first log search with keyset pagination.
+        app_filter: case-insensitive substring of the app name
+        ip: exact address, or a prefix ending in '*' (e.g. "192.168.*"), matched on src or dst
+        start/end: timestamp range; cursor: the value returned with the previous page
+        Returns (rows, next_cursor). Rows: (ts, app, down, up, src, dst, id, src_host, dst_host),
+        hosts being None where no name is known
+        """
+        common = []
+        params = []
+        if start is not None:
+            common.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            common.append("timestamp < ?")
+            params.append(end)
+        if cursor is not None:
+            common.append("(timestamp, id) < (?, ?)")
+            params.extend(cursor)
+
+        # Each branch is read in (timestamp, id) order straight from an index and
+        # stops at `limit`; the branches are then merged. An IN/OR over several
+        # indexed values would make SQLite sort every matching row instead.
+        # - few app names: one branch per name on idx_logs_app (forced: without
+        #   ANALYZE SQLite prefers the ip index, which for the host's own address
+        #   covers nearly every row), the ip tested on each row it walks
+        # - many app names: a single walk of idx_logs_timestamp with the app
+        #   substring tested per row, rather than hundreds of branches
+        # - ip only: one branch each on idx_logs_src and idx_logs_dst
+        ip_clause, ip_params = None, ()
+        if ip:
+            op = "GLOB" if ip.endswith("*") else "="
+            ip_clause, ip_params = f"(src_ip {op} ? OR dst_ip {op} ?)", (ip, ip)
+        branches = [("", [], ())]
+        if app_filter:
+            names = set(self.match_apps(app_filter))
+            names.add(app_filter)
+            if len(names) <= MAX_APP_BRANCHES:
+                branches = [("INDEXED BY idx_logs_app", ["app_name = ?"], (name,)) for name in sorted(names)]
+            else:
+                pattern = "%" + app_filter.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                branches = [("INDEXED BY idx_logs_timestamp", ["app_name LIKE ? ESCAPE '\\'"], (pattern,))]
+            if ip_clause:
+                branches = [(hint, where + [ip_clause], (*values, *ip_params)) for hint, where, values in branches]
+        elif ip_clause:
+            branches = [("", [f"src_ip {op} ?"], (ip,)), ("", [f"dst_ip {op} ?"], (ip,))]
+
+        merged = {}
+        for hint, where, values in branches:
+            where = where + common
+            sql = f"""
+                SELECT timestamp, app_name, download_speed, upload_speed, src_ip, dst_ip, id
+                FROM instance_logs {hint}
+            """
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+            for row in self._query(sql, (*values, *params, limit)):
+                merged[row[6]] = row
+
+        rows = heapq.nlargest(limit, merged.values(), key=lambda r: (r[0], r[6]))
+        next_cursor = (rows[-1][0], rows[-1][6]) if len(rows) == limit else None
+        names = self.hostnames({ip for row in rows for ip in row[4:6]})
+        rows = [row + (names.get(row[4]), names.get(row[5])) for row in rows]
+        return rows, next_cursor
+
+    def hostnames(self, ips):
+        """{ip: hostname} for the given addresses that have a stored name."""
+        ips = [ip for ip in ips if ip]
+        found = {}
+        # Chunked to stay under SQLite's bound-parameter limit
+        for i in range(0, len(ips), 500):
+            chunk = ips[i:i + 500]
+            sql = f"SELECT ip, hostname FROM hostnames WHERE ip IN ({', '.join('?' * len(chunk))})"
+            found.update(self._query(sql, chunk))
+        return found
+
+    def query_history(self, start, end, resolution=None, app_filter=None, by_endpoint=False):
+        """
+        Bytes per time bucket over [start, end), read from the coarsest rollup
+        tier that fits `resolution` seconds (default: ~500 buckets).
+        Rows: (bucket, app_name, [src_ip, dst_ip,] download_bytes, upload_bytes[, src_host, dst_host])
+        """
+        resolution = max(1, int(resolution or (end - start) / 500))
+        # On the reader connection: the writer holds self.lock through whole maintenance passes
+        watermarks = dict(self._query("SELECT tier, watermark FROM rollup_state"))
+        segments = rollups.history_segments(start, end, resolution, watermarks, self.retention)
+
+        keys = "app_name, src_ip, dst_ip" if by_endpoint else "app_name"
+        totals = {}
+        for tier_index, lo, hi in segments:
+            name, table, _size = rollups.TIERS[tier_index]
+            if name == "raw":
+                time_col = "timestamp"
+                down, up = "COALESCE(download_bytes, download_speed * 1024)", "COALESCE(upload_bytes, upload_speed * 1024)"
+            else:
+                time_col, down, up = "bucket", "download_bytes", "upload_bytes"
+            sql = f"""
+                SELECT CAST({time_col} / ? AS INTEGER) * ?, {keys}, SUM({down}), SUM({up})
+                FROM {table}
+                WHERE {time_col} >= ? AND {time_col} < ?
+            """
+            params = [resolution, resolution, lo, hi]
+            if app_filter:
+                sql += " AND app_name = ?"
+                params.append(app_filter)
+            sql += " GROUP BY 1, " + keys
+
+            # Segments can meet inside one bucket; merge them
+            for row in self._query(sql, params):
+                key = row[:-2]
+                acc = totals.get(key)
+                if acc is None:
+                    totals[key] = [row[-2] or 0, row[-1] or 0]
+                else:
+                    acc[0] += row[-2] or 0
+                    acc[1] += row[-1] or 0
+        rows = sorted(key + (down, up) for key, (down, up) in totals.items())
+        if by_endpoint:
+            names = self.hostnames({ip for row in rows for ip in row[2:4]})
+            rows = [row + (names.get(row[2]), names.get(row[3])) for row in rows]
+        return rows
 
+    # --- Writes (queued to the writer thread) ---
     def save_traffic(self, traffic_dict):
-        with self.lock:
-            for app, (down, up) in traffic_dict.items():
-                self.cursor.execute("""
-                    INSERT OR REPLACE INTO app_traffic (app_name, download_bytes, upload_bytes)
-                    VALUES (?, ?, ?)
-                """, (app, down, up))
-            self.conn.commit()
+        """Upserts absolute totals for the given apps (callers pass only what changed)."""
+        # Copy now: the caller keeps mutating its totals
+        rows = [(app, down, up) for app, (down, up) in traffic_dict.items()]
+        self._enqueue("traffic", rows)
 
     def log_instances(self, instances):
         if not instances: return
-        with self.lock:
-            self.cursor.executemany("""
-                INSERT INTO instance_logs (timestamp, app_name, download_speed, upload_speed, src_ip, dst_ip)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, instances)
-            self.conn.commit()
+        self._enqueue("logs", list(instances))
 
-    def fetch_logs(self, limit=100, app_filter=None):
-        """Fetches logs, optionally filtering by app_name"""
-        with self.lock:
-            if app_filter:
-                query = """
-                    SELECT timestamp, app_name, download_speed, upload_speed, src_ip, dst_ip 
-                    FROM instance_logs 
-                    WHERE app_name LIKE ?
-                    ORDER BY id DESC LIMIT ?
-                """
-                self.cursor.execute(query, (f"%{app_filter}%", limit))
-            else:
-                self.cursor.execute("""
-                    SELECT timestamp, app_name, download_speed, upload_speed, src_ip, dst_ip 
-                    FROM instance_logs 
-                    ORDER BY id DESC LIMIT ?
-                """, (limit,))
-            return self.cursor.fetchall()
+    def save_hostnames(self, names):
+        """Upserts (ip, hostname, resolved_at) rows."""
+        if not names: return
+        self._enqueue("hostnames", list(names))
+
+    def _enqueue(self, kind, rows):
+        try:
+            self.queue.put_nowait((kind, rows))
+        except queue.Full:
+            # Never stall the caller on a slow disk; the loss is counted instead
+            self.stats["dropped"] += len(rows)
+
+    def flush(self, timeout=None):
+        """Blocks until everything queued so far has been committed."""
+        done = threading.Event()
+        self.queue.put(("flush", done))
+        return done.wait(timeout)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        stats["commit_ms_avg"] = stats["commit_ms_total"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _writer_loop(self):
+        while True:
+            # Only when idle: rows still queued must not fall behind a rollup watermark
+            if time.monotonic() >= self._next_maintenance and self.queue.empty():
+                self._maintain()
+            try:
+                batch = [self.queue.get(timeout=self.maintenance_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            rows = 0
+
+            # Group whatever arrives until the batch is big enough or old enough,
+            # or someone is waiting on a flush / shutdown
+            while True:
+                kind, payload = batch[-1]
+                if kind in ("flush", "stop"):
+                    break
+                rows += len(payload)
+                remaining = deadline - time.monotonic()
+                if rows >= self.batch_rows or remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._commit(batch)
+            if batch[-1][0] == "stop":
+                return
+
+    def _commit(self, batch):
+        waiters = [payload for kind, payload in batch if kind == "flush"]
+        logs = [row for kind, payload in batch if kind == "logs" for row in payload]
+        traffic = {}
+        names = {}
+        for kind, payload in batch:
+            if kind == "traffic":
+                traffic.update((row[0], row) for row in payload)
+            elif kind == "hostnames":
+                names.update((row[0], row) for row in payload)
+
+        if logs or traffic or names:
+            start = time.perf_counter()
+            try:
+                with self.lock:
+                    with self.conn:
+                        if logs:
+                            self.conn.executemany("""
+                                INSERT INTO instance_logs (timestamp, app_name, download_speed, upload_speed, src_ip, dst_ip,
+                                                           download_bytes, upload_bytes)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                            """, logs)
+                        if traffic:
+                            self.conn.executemany("""
+                                INSERT INTO app_traffic (app_name, download_bytes, upload_bytes)
+                                VALUES (?, ?, ?)
+                                ON CONFLICT (app_name) DO UPDATE SET
+                                    download_bytes = excluded.download_bytes,
+                                    upload_bytes = excluded.upload_bytes
+                            """, traffic.values())
+                        if names:
+                            self.conn.executemany("""
+                                INSERT INTO hostnames (ip, hostname, resolved_at) VALUES (?, ?, ?)
+                                ON CONFLICT (ip) DO UPDATE SET
+                                    hostname = excluded.hostname,
+                                    resolved_at = excluded.resolved_at
+                            """, names.values())
+            except sqlite3.Error as e:
+                print(f"DB Write Error: {e}")
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats = self.stats
+            stats["batches"] += 1
+            stats["rows"] += len(logs) + len(traffic) + len(names)
+            stats["commit_ms_last"] = elapsed_ms
+            stats["commit_ms_total"] += elapsed_ms
+            if elapsed_ms > stats["commit_ms_max"]:
+                stats["commit_ms_max"] = elapsed_ms
+
+        for done in waiters:
+            done.set()
+
+    def _maintain(self):
+        """Rollups and retention, run between batches on the writer thread."""
+        start = time.perf_counter()
+        try:
+            with self.lock:
+                self.stats["rolled_up"] += rollups.run_rollups(self.conn)
+                self.stats["expired"] += rollups.run_retention(self.conn, self.retention)
+        except sqlite3.Error as e:
+            print(f"DB Maintenance Error: {e}")
+        self.stats["maintenance_ms_last"] = (time.perf_counter() - start) * 1000
+        self._next_maintenance = time.monotonic() + self.maintenance_interval
 
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self.queue.put(("stop", None))
+        self.writer.join(timeout=10)
+        with self._readers_lock:
+            for _thread, conn in self._readers:
+                conn.close()
+            self._readers = []
+        self.conn.close()
@@ -0,0 +1,171 @@
+import time
+
+OVERFLOW_IP = "*"
+UNKNOWN_APP = "System (Unknown)"
+
+
+class FlowRecord:
+    """
+    One bidirectional flow, oriented as its first packet was. Only the delta
+    counters and last_seen are touched per packet; totals are folded in when
+    the deltas are exported.
+    """
+    __slots__ = ("proto", "src_ip", "sport", "dst_ip", "dport", "app_name", "fwd_up",
+                 "first_seen", "last_seen", "attributed_at",
+                 "bytes_down", "bytes_up", "packets",
+                 "d_down", "d_up", "d_packets", "dirty")
+
+    def __init__(self, proto, src_ip, sport, dst_ip, dport, app_name, fwd_up, now):
+        self.proto = proto
+        self.src_ip = src_ip
+        self.sport = sport
+        self.dst_ip = dst_ip
+        self.dport = dport
+        self.app_name = app_name
+        self.fwd_up = fwd_up  # Packets in the record's orientation are uploads
+        self.first_seen = now
+        self.last_seen = now
+        self.attributed_at = now
+        self.bytes_down = 0
+        self.bytes_up = 0
+        self.packets = 0
+        self.d_down = 0
+        self.d_up = 0
+        self.d_packets = 0
+        self.dirty = False
+
+
+class FlowTable:
+    """
+    Flows keyed by (proto, src_ip, sport, dst_ip, dport) in either orientation,
+    attributed to an app once, when the flow is created (and re-tried while it
+    stays "System (Unknown)", except for overflow records).
+
+    Bounded: at `max_flows` entries, packets of new flows go to one overflow
+    record per app instead, so a scan or flood can't grow the table. Flows are
+    expired by expire(): after `idle_timeout` without packets (`embryonic_timeout`
+    for single-packet flows, e.g. scan probes), and after `active_timeout`
+    regardless, so long-lived flows are re-attributed now and then.
+
+    Not thread-safe: owned by the capture thread.
+    """
+
+    def __init__(self, attribute, max_flows=65536, idle_timeout=30.0, active_timeout=300.0,
+                 embryonic_timeout=5.0, unknown_retry=2.0, clock=time.monotonic):
+        # attribute(proto, src_ip, dst_ip, sport, dport) -> (app_name, is_upload)
+        self.attribute = attribute
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.embryonic_timeout = embryonic_timeout
+        self.unknown_retry = unknown_retry
+        self.clock = clock
+        self.flows = {}
+        self.overflow = {}  # (proto, app_name) -> FlowRecord
+        self.touched = []  # Records with unexported deltas
+        self.counters = {"created": 0, "expired_idle": 0, "expired_active": 0,
+                         "overflow_packets": 0, "peak": 0}
+
+    def __len__(self):
+        return len(self.flows)
+
+    def update(self, proto, src_ip, dst_ip, sport, dport, size, now):
+        """Counts one packet. Returns (record, is_upload)."""
+        flows = self.flows
+        record = flows.get((proto, src_ip, sport, dst_ip, dport))
+        if record is not None:
+            upload = record.fwd_up
+        else:
+            record = flows.get((proto, dst_ip, dport, src_ip, sport))
+            if record is not None:
+                upload = not record.fwd_up
+            else:
+                record, upload = self._create(proto, src_ip, dst_ip, sport, dport, now)
+
+        if (record.app_name == UNKNOWN_APP and sport is not None and record.src_ip != OVERFLOW_IP
+                and now - record.attributed_at >= self.unknown_retry):
+            # The owning socket may have shown up in the index since. Not for the shared
+            # overflow records: _create has just attributed this packet, and renaming the
+            # bucket would charge every later unknown packet to this one's app
+
+            app_name, is_upload = self.attribute(proto, src_ip, dst_ip, sport, dport)
+            record.attributed_at = now
+            if app_name != UNKNOWN_APP:
+                record.app_name = app_name
+                record.fwd_up = is_upload if record.src_ip == src_ip and record.sport == sport else not is_upload
+                upload = is_upload
+
+        if upload:
+            record.d_up += size
+        else:
+            record.d_down += size
+        record.d_packets += 1
+        record.last_seen = now
+        if not record.dirty:
+            record.dirty = True
+            self.touched.append(record)
+        return record, upload
+
+    def _create(self, proto, src_ip, dst_ip, sport, dport, now):
+        app_name, upload = self.attribute(proto, src_ip, dst_ip, sport, dport)
+        if len(self.flows) >= self.max_flows:
+            self.counters["overflow_packets"] += 1
+            record = self.overflow.get((proto, app_name))
+            if record is None:
+                record = self.overflow[(proto, app_name)] = FlowRecord(proto, OVERFLOW_IP, 0, OVERFLOW_IP, 0,
+                                                               app_name, True, now)
+            # Overflow records have no orientation: direction comes from this packet
+            return record, upload
+
+        record = FlowRecord(proto, src_ip, sport, dst_ip, dport, app_name, upload, now)
+        self.flows[(proto, src_ip, sport, dst_ip, dport)] = record
+        self.counters["created"] += 1
+        if len(self.flows) > self.counters["peak"]:
+            self.counters["peak"] = len(self.flows)
+        return record, upload
+
+    def export(self):
+        """
+        Deltas since the last export, one tuple per touched flow:
+        (proto, src_ip, sport, dst_ip, dport, app_name, down_bytes, up_bytes, packets)
+        """
+        touched = self.touched
+        self.touched = []
+        out = []
+        for record in touched:
+            out.append((record.proto, record.src_ip, record.sport, record.dst_ip, record.dport,
+                        record.app_name, record.d_down, record.d_up, record.d_packets))
+            record.bytes_down += record.d_down
+            record.bytes_up += record.d_up
+            record.packets += record.d_packets
+            record.d_down = record.d_up = record.d_packets = 0
+            record.dirty = False
+        return out
+
+    def expire(self, now=None):
+        """Drops idle and over-age flows (call after export(), so no deltas are lost)."""
+        now = self.clock() if now is None else now
+        idle_limit = now - self.idle_timeout
+        embryonic_limit = now - self.embryonic_timeout
+        active_limit = now - self.active_timeout
+        stale = []
+        for key, record in self.flows.items():
+            if record.dirty:
+                continue
+            if record.last_seen <= idle_limit or (record.packets <= 1 and record.last_seen <= embryonic_limit):
+                stale.append(key)
+                self.counters["expired_idle"] += 1
+            elif record.first_seen <= active_limit:
+                stale.append(key)
+                self.counters["expired_active"] += 1
+        for key in stale:
+            del self.flows[key]
+        # Overflow buckets are only needed while the table is full
+        if self.overflow and len(self.flows) < self.max_flows:
+            self.overflow = {key: r for key, r in self.overflow.items() if r.dirty}
+        return len(stale)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update(flows=len(self.flows), overflow_apps=len(self.overflow), max_flows=self.max_flows)
+        return stats
@@ -0,0 +1,92 @@
+import sqlite3
+import threading
+import uuid
+
+
+class Outbox:
+    """
+    Durable queue of log rows waiting for cloud upload, in its own SQLite file.
+    Rows are read with peek() and only deleted by ack() once the server has
+    accepted them, so a crash or a failed POST never loses a batch; whatever
+    is left is uploaded after a restart. Holds at most `max_rows`: beyond
+    that the oldest rows are deleted (and counted).
+    """
+
+    def __init__(self, path="cloud_outbox.db", max_rows=200000):
+        self.path = path
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp REAL,
+                    app_name TEXT,
+                    download_speed REAL,
+                    upload_speed REAL,
+                    src_ip TEXT,
+                    dst_ip TEXT,
+                    download_bytes INTEGER,
+                    upload_bytes INTEGER
+                )
+            """)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS outbox_meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM outbox_meta WHERE key = 'agent_id'").fetchone()
+            if row is None:
+                row = (uuid.uuid4().hex,)
+                self.conn.execute("INSERT INTO outbox_meta (key, value) VALUES ('agent_id', ?)", row)
+        # Stable per install, so the server can drop batches it has already seen
+        self.agent_id = row[0]
+        self.count = self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        self.dropped = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, rows):
+        if not rows:
+            return
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT INTO outbox (timestamp, app_name, download_speed, upload_speed,
+                                    src_ip, dst_ip, download_bytes, upload_bytes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self.count += len(rows)
+            overflow = self.count - self.max_rows
+            if overflow > 0:
+                # Ids are increasing, so the oldest rows are the lowest ids
+                self.conn.execute("""
+                    DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)
+                """, (overflow,))
+                self.count -= overflow
+                self.dropped += overflow
+
+    def peek(self, limit):
+        """The oldest `limit` rows as (ids, rows) without removing them."""
+        with self.lock:
+            fetched = self.conn.execute("""
+                SELECT id, timestamp, app_name, download_speed, upload_speed,
+                       src_ip, dst_ip, download_bytes, upload_bytes
+                FROM outbox ORDER BY id LIMIT ?
+            """, (limit,)).fetchall()
+        return [row[0] for row in fetched], [row[1:] for row in fetched]
+
+    def ack(self, last_id):
+        """Deletes everything up to and including `last_id` (the server has it)."""
+        with self.lock, self.conn:
+            deleted = self.conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,)).rowcount
+            self.count = max(0, self.count - deleted)
+
+    def clear(self):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM outbox")
+            self.count = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
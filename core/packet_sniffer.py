@@ -1,121 +1,194 @@
 import threading
 import time
-import psutil
-from scapy.all import sniff, TCP, IP, UDP
-from core.platform import IS_WINDOWS
-
-if IS_WINDOWS:
-    from scapy.all import conf
-    conf.use_pcap = True
+from core import config
+from core.capture import get_backend
+from core.socket_index import SocketIndex
+from core.cache import TTLCache, MISSING
+from core.rtt import HandshakeTracker, TCP_SYN
+from core.flow_table import FlowTable
 
 class PacketSniffer:
-    def __init__(self):
+    def __init__(self, backend=None, socket_index=None, batch_size=256, publish_interval=0.1):
         self.running = False
-        self.traffic_data = {} # Key: (app_name, src_ip, dst_ip), Value: [down, up]
+        # Key: (proto, src_ip, sport, dst_ip, dport, app_name), Value: [down, up, packets]
+        self.traffic_data = {}
         self.lock = threading.Lock()
-        self.port_cache = {}
-        self.cache_timeout = 10 
+
+        # Capture-thread-private flow table; its deltas are merged into
+        # traffic_data once per batch so the per-packet path never takes self.lock
+        self.flows = FlowTable(self._attribute, max_flows=config.FLOW_MAX_ENTRIES,
+                               idle_timeout=config.FLOW_IDLE_TIMEOUT, active_timeout=config.FLOW_ACTIVE_TIMEOUT)
+        self._last_expire = time.monotonic()
+        self._pending_count = 0
+        self._last_publish = time.monotonic()
+        self.batch_size = batch_size
+        self.publish_interval = publish_interval
+        self.drain_stats = {"drains": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0, "publishes": 0}
+        self.backend = backend
+        self.socket_index = socket_index if socket_index is not None else SocketIndex()
+        # Key: (proto, ip, port). "Unknown" is cached too, for a shorter time
+        self.port_cache = TTLCache(max_size=8192, ttl=10, negative_ttl=2)
+        # Passive handshake RTT: capture-thread-private tracker, samples published with each batch
+        self.rtt_tracker = HandshakeTracker()
+        self._pending_rtt = []
+        self.rtt_samples = []  # (app_name, remote_ip, rtt_ms), guarded by self.lock
 
     def start(self):
         self.running = True
+        if self.backend is None:
+            self.backend = get_backend(config.CAPTURE_BACKEND)
+        self.socket_index.start()
         self.thread = threading.Thread(target=self._sniff_loop)
         self.thread.daemon = True
         self.thread.start()
 
     def stop(self):
         self.running = False
+        self.socket_index.stop()
 
     def get_traffic_data(self):
+        """
+        Flow deltas since the last call:
+        [(proto, src_ip, sport, dst_ip, dport, app_name, down_bytes, up_bytes, packets), ...]
+        """
+        start = time.perf_counter()
         with self.lock:
-            data = self.traffic_data.copy()
-            self.traffic_data.clear()
+            data = self.traffic_data
+            self.traffic_data = {}
+        data = [key + tuple(counts) for key, counts in data.items()]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        stats = self.drain_stats
+        stats["drains"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["last_ms"] = elapsed_ms
+        if elapsed_ms > stats["max_ms"]:
+            stats["max_ms"] = elapsed_ms
         return data
 
+    def get_rtt_samples(self):
+        with self.lock:
+            samples = self.rtt_samples
+            self.rtt_samples = []
+        return samples
+
+    def get_drain_stats(self):
+        stats = dict(self.drain_stats)
+        stats["avg_ms"] = stats["total_ms"] / stats["drains"] if stats["drains"] else 0.0
+        return stats
+
+    def flush(self):
+        """Publishes the capture thread's pending batch. Must run on the capture thread."""
+        pending = self.flows.export()
+        self._pending_count = 0
+        now = self._last_publish = time.monotonic()
+        if now - self._last_expire >= 1.0:
+            self._last_expire = now
+            self.flows.expire(now)
+        rtt = self._pending_rtt
+        if rtt:
+            self._pending_rtt = []
+        if self.rtt_tracker.pending:
+            self.rtt_tracker.expire()
+        if not pending and not rtt:
+            return
+
+        with self.lock:
+            if rtt:
+                self.rtt_samples.extend(rtt)
+            published = self.traffic_data
+            for delta in pending:
+                key = delta[:6]
+                totals = published.get(key)
+                if totals is None:
+                    published[key] = [delta[6], delta[7], delta[8]]
+                else:
+                    totals[0] += delta[6]
+                    totals[1] += delta[7]
+                    totals[2] += delta[8]
+        self.drain_stats["publishes"] += 1
+
     def _sniff_loop(self):
         while self.running:
             try:
-                sniff(prn=self._on_packet, store=False, timeout=1)
+                self.backend.capture(self._on_packet, timeout=1)
+                self.flush()
             except Exception as e:
                 print(f"Sniff Error: {e}")
                 time.sleep(1)
+        self.backend.close()
 
-    def _on_packet(self, pkt):
+    def _on_packet(self, proto, src_ip, dst_ip, sport, dport, size, flags=0):
         if not self.running:
             return
-        
-        if IP in pkt:
-            try:
-                size = len(pkt)
-                app_name = "System (Unknown)"
-                direction = "down"
-                src_ip = pkt[IP].src
-                dst_ip = pkt[IP].dst
-
-                # A. Handle TCP/UDP
-                if TCP in pkt or UDP in pkt:
-                    if TCP in pkt: layer = TCP
-                    else: layer = UDP
-                        
-                    sport = pkt[layer].sport
-                    dport = pkt[layer].dport
-                    
-                    app_by_dst = self._get_process_by_port(dport)
-                    
-                    if app_by_dst != "Unknown":
-                        app_name = app_by_dst
-                        direction = "down"
-                    else:
-                        app_by_src = self._get_process_by_port(sport)
-                        if app_by_src != "Unknown":
-                            app_name = app_by_src
-                            direction = "up"
-                        else:
-                            app_name = "System (Unknown)"
-                            direction = "down"
-
-                elif pkt[IP].proto == 1:
-                    app_name = "System (ICMP/Ping)"
-                    direction = "down" 
-                else:
-                    proto_id = pkt[IP].proto
-                    app_name = f"System (Proto {proto_id})"
-                    direction = "down"
-
-                # Update Data with IPs
-                key = (app_name, src_ip, dst_ip)
-                
-                with self.lock:
-                    if key not in self.traffic_data:
-                        self.traffic_data[key] = [0, 0]
-                    
-                    if direction == "down":
-                        self.traffic_data[key][0] += size
-                    else:
-                        self.traffic_data[key][1] += size
-
-            except Exception:
-                pass
-        
-        elif "ARP" in pkt:
-            pass
-
-    def _get_process_by_port(self, port):
-        now = time.time()
-        if port in self.port_cache:
-            app, ts = self.port_cache[port]
-            if now - ts < self.cache_timeout:
-                return app
 
         try:
-            for c in psutil.net_connections(kind="inet"):
-                if c.laddr.port == port:
-                    try:
-                        p = psutil.Process(c.pid)
-                        name = p.name()
-                        self.port_cache[port] = (name, now)
-                        return name
-                    except:
-                        pass
-        except:
+            now = time.monotonic()
+            rtt = None
+            if proto == 6 and sport is not None and (flags & TCP_SYN or self.rtt_tracker.pending):
+                rtt = self.rtt_tracker.observe(src_ip, dst_ip, sport, dport, flags)
+
+            # Attribution happens once per flow, not per packet (private table, no lock)
+            record, upload = self.flows.update(proto, src_ip, dst_ip, sport, dport, size, now)
+
+            if rtt is not None:
+                # The handshake's last ACK: the remote end is whichever side isn't ours
+                self._pending_rtt.append((record.app_name, dst_ip if upload else src_ip, rtt))
+
+            self._pending_count += 1
+            if self._pending_count >= self.batch_size or now - self._last_publish >= self.publish_interval:
+                self.flush()
+
+        except Exception:
             pass
-        return "Unknown"
\ No newline at end of file
+
+    def _attribute(self, proto, src_ip, dst_ip, sport, dport):
+        """(app_name, is_upload) for a flow's first packet."""
+        # A. Handle TCP/UDP
+        if sport is not None:
+            # An exact (ip, port) socket on either end wins over a wildcard listener on the other
+            hit = self.socket_index.lookup(proto, dst_ip, dport, fallback=False)
+            if hit is not None:
+                return hit[1], False
+            hit = self.socket_index.lookup(proto, src_ip, sport, fallback=False)
+            if hit is not None:
+                return hit[1], True
+            app_by_dst = self._get_process_by_port(proto, dst_ip, dport)
+            if app_by_dst != "Unknown":
+                return app_by_dst, False
+            app_by_src = self._get_process_by_port(proto, src_ip, sport, refresh_on_miss=True)
+            if app_by_src != "Unknown":
+                return app_by_src, True
+            return "System (Unknown)", False
+        elif proto == 1 or proto == 58:
+            return "System (ICMP/Ping)", False
+        return f"System (Proto {proto})", False
+
+    def _get_process_by_port(self, proto, ip, port, refresh_on_miss=False):
+        # Hot path: dict lookups only, psutil runs on the index's own thread
+        key = (proto, ip, port)
+        app = self.port_cache.get(key)
+        if app is not MISSING:
+            return app
+
+        hit = self.socket_index.lookup(proto, ip, port)
+        if hit is None:
+            # Negative entry: a port scan or flood only reaches the index once per key
+            self.port_cache.put(key, "Unknown", negative=True)
+            if refresh_on_miss:
+                # Possibly a socket opened since the last snapshot
+                self.socket_index.request_refresh()
+            return "Unknown"
+
+        self.port_cache.put(key, hit[1])
+        return hit[1]
+
+    def get_cache_stats(self):
+        return self.port_cache.stats()
+
+    def get_flow_stats(self):
+        return self.flows.stats()
+
+    def get_capture_stats(self):
+        """Drain timing, flow table and port cache counters, as shown in status displays."""
+        return {"drain": self.get_drain_stats(), "flows": self.get_flow_stats(), "port_cache": self.get_cache_stats()}
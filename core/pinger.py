@@ -1,63 +1,321 @@
-import subprocess
+import asyncio
+import os
+import socket
+import struct
 import threading
 import time
-import platform
-import re
+from collections import deque
+
+from core import config
+
+# Samples kept per target for loss and percentiles
+HISTORY = 100
+# Cap on simultaneous TCP/UDP probes, so hundreds of targets don't exhaust file descriptors
+MAX_SOCKET_PROBES = 256
+
+ICMP_ECHO_REQUEST = {socket.AF_INET: 8, socket.AF_INET6: 128}
+ICMP_ECHO_REPLY = {socket.AF_INET: 0, socket.AF_INET6: 129}
+ICMP_PROTO = {socket.AF_INET: socket.IPPROTO_ICMP, socket.AF_INET6: socket.IPPROTO_ICMPV6}
+ICMP_HEADER = struct.Struct("!BBHHH")
+ICMP_PAYLOAD = b"packetsentry-rtt"
+
+# DNS query for the root NS records, so a resolver on port 53 actually answers
+DNS_PROBE = struct.pack("!HHHHHH", 0x5053, 0x0100, 1, 0, 0, 0) + b"\x00" + struct.pack("!HH", 2, 1)
+
+
+def parse_targets(spec):
+    """
+    Parses "Name=host,Name=tcp:host:port,Name=udp:host:port" into
+    {name: (method, host, port)}. Plain hosts get method "auto" (ICMP with a
+    TCP-connect fallback).
+    """
+    targets = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, dest = (part.strip() for part in item.split("=", 1))
+        method, port = "auto", None
+        if dest.startswith(("tcp:", "udp:")):
+            method, dest = dest.split(":", 1)
+            dest, _, port_text = dest.rpartition(":")
+            port = int(port_text)
+        targets[name] = (method, dest.strip("[]"), port)
+    return targets
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+class TargetStats:
+    def __init__(self, method):
+        self.method = method
+        self.samples = deque(maxlen=HISTORY)  # RTT in ms, None = lost
+        self.sent = 0
+        self.received = 0
+        self.jitter = 0.0
+        self.last = None
+
+    def add(self, rtt):
+        self.sent += 1
+        self.samples.append(rtt)
+        if rtt is None:
+            return
+        self.received += 1
+        # RFC 3550 interarrival jitter: smoothed mean of successive RTT differences
+        if self.last is not None:
+            self.jitter += (abs(rtt - self.last) - self.jitter) / 16
+        self.last = rtt
+
+    def summary(self):
+        rtts = sorted(r for r in self.samples if r is not None)
+        lost = len(self.samples) - len(rtts)
+        return {
+            "method": self.method,
+            "sent": self.sent,
+            "received": self.received,
+            "loss": round(100.0 * lost / len(self.samples), 1) if self.samples else 0.0,
+            "last": self.samples[-1] if self.samples else None,
+            "jitter": round(self.jitter, 2),
+            "p50": _percentile(rtts, 50),
+            "p95": _percentile(rtts, 95),
+            "p99": _percentile(rtts, 99),
+        }
+
+
+class IcmpProber:
+    """
+    ICMP echo over one shared socket per address family. Prefers unprivileged
+    datagram ICMP sockets (Linux ping_group_range, macOS) and falls back to raw
+    sockets when running privileged. Replies are matched by sequence number.
+    """
+
+    def __init__(self, loop, family):
+        self.loop = loop
+        self.family = family
+        try:
+            self.sock = socket.socket(family, socket.SOCK_DGRAM, ICMP_PROTO[family])
+            self.raw = False
+        except OSError:
+            self.sock = socket.socket(family, socket.SOCK_RAW, ICMP_PROTO[family])
+            self.raw = True
+        # Room for a full round of replies (raw sockets on loopback also see our requests)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.sock.setblocking(False)
+        # Datagram sockets get their identifier rewritten by the kernel; raw ones keep ours
+        self.ident = os.getpid() & 0xFFFF
+        self.seq = 0
+        self.pending = {}  # seq -> (future, address)
+        try:
+            loop.add_reader(self.sock.fileno(), self._on_readable)
+        except NotImplementedError:  # Proactor event loop (Windows)
+            self.sock.close()
+            raise OSError("event loop can't watch ICMP sockets")
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+
+    async def probe(self, address, timeout):
+        self.seq = (self.seq + 1) & 0xFFFF
+        seq = self.seq
+        header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST[self.family], 0, 0, self.ident, seq)
+        if self.family == socket.AF_INET:
+            # ICMPv6 checksums are always filled in by the kernel
+            header = ICMP_HEADER.pack(ICMP_ECHO_REQUEST[self.family], 0,
+                                      _checksum(header + ICMP_PAYLOAD), self.ident, seq)
+        future = self.loop.create_future()
+        self.pending[seq] = (future, address)
+        sent_at = time.perf_counter()
+        try:
+            self.sock.sendto(header + ICMP_PAYLOAD, (address, 0))
+            received_at = await asyncio.wait_for(future, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self.pending.pop(seq, None)
+        return (received_at - sent_at) * 1000
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received_at = time.perf_counter()
+            # IPv4 raw sockets (and macOS datagram ones) include the IP header
+            if self.family == socket.AF_INET and data and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < ICMP_HEADER.size:
+                continue
+            icmp_type, _code, _sum, ident, seq = ICMP_HEADER.unpack_from(data)
+            if icmp_type != ICMP_ECHO_REPLY[self.family]:
+                continue
+            if self.raw and ident != self.ident:
+                continue
+            entry = self.pending.get(seq)
+            if entry and entry[1] == addr[0] and not entry[0].done():
+                entry[0].set_result(received_at)
+
+
+async def tcp_probe(address, port, timeout):
+    """Time to complete (or be refused) a TCP handshake, in ms."""
+    started = time.perf_counter()
+    try:
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    except ConnectionRefusedError:
+        # An RST is still a round trip to the host
+        return (time.perf_counter() - started) * 1000
+    except (OSError, asyncio.TimeoutError):
+        return None
+    rtt = (time.perf_counter() - started) * 1000
+    writer.close()
+    return rtt
+
+
+class _UdpProbeProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(time.perf_counter())
+
+    def error_received(self, exc):
+        # ICMP port unreachable surfaces as ECONNREFUSED: the host answered
+        if isinstance(exc, ConnectionRefusedError) and not self.future.done():
+            self.future.set_result(time.perf_counter())
+
+
+async def udp_probe(address, port, timeout):
+    """Time until a UDP reply or a port-unreachable comes back, in ms."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    try:
+        transport, _protocol = await loop.create_datagram_endpoint(
+            lambda: _UdpProbeProtocol(future), remote_addr=(address, port))
+    except OSError:
+        return None
+    try:
+        started = time.perf_counter()
+        transport.sendto(DNS_PROBE if port == 53 else b"\x00")
+        received_at = await asyncio.wait_for(future, timeout)
+        return (received_at - started) * 1000
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        transport.close()
+
 
 class NetworkPinger:
-    def __init__(self):
+    """
+    Probes every configured target concurrently once per interval from an
+    asyncio loop on a background thread. get_pings() keeps the old contract
+    (latest RTT in ms, 0.0 when lost); get_stats() adds loss, jitter and
+    percentiles per target.
+    """
+
+    def __init__(self, targets=None, interval=None, timeout=None):
         self.running = False
         self.lock = threading.Lock()
-        # TARGETS:
-        # 1. Cloudflare (1.1.1.1)
-        # 2. Google (8.8.8.8)
-        # 3. Mumbai Server (Quad9 DNS - 9.9.9.9) - Guaranteed to reply
-        self.targets = {
-            "Cloudflare (1.1.1.1)": "1.1.1.1",
-            "Google (8.8.8.8)": "8.8.8.8",
-            "Mumbai Server": "9.9.9.9" 
-        }
+        self.targets = parse_targets(config.PING_TARGETS) if targets is None else targets
+        self.interval = config.PING_INTERVAL if interval is None else interval
+        self.timeout = config.PING_TIMEOUT if timeout is None else timeout
         self.pings = {name: 0.0 for name in self.targets}
+        self.stats = {name: TargetStats(method) for name, (method, _host, _port) in self.targets.items()}
+        self.round_time = 0.0
+        self.loop = None
 
     def start(self):
         self.running = True
-        self.thread = threading.Thread(target=self._ping_loop, daemon=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
         self.thread.start()
 
     def stop(self):
         self.running = False
+        if self.loop is not None:
+            try:
+                self.loop.call_soon_threadsafe(self._wakeup.set)
+            except RuntimeError:  # Loop already closed
+                pass
 
     def get_pings(self):
         with self.lock:
             return self.pings.copy()
 
-    def _ping_loop(self):
-        while self.running:
-            for name, ip in self.targets.items():
-                if not self.running: break
-                latency = self._measure_ping(ip)
+    def get_stats(self):
+        with self.lock:
+            return {name: stats.summary() for name, stats in self.stats.items()}
+
+    def _run(self):
+        asyncio.run(self._main())
 
-                with self.lock:
-                    self.pings[name] = latency
-            time.sleep(1) 
+    async def _main(self):
+        self._wakeup = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(MAX_SOCKET_PROBES)
+        self._icmp = {}
+        self._addresses = {}
+        for family in (socket.AF_INET, socket.AF_INET6):
+            try:
+                self._icmp[family] = IcmpProber(self.loop, family)
+            except OSError:
+                pass  # No ICMP permission for this family: "auto" targets use TCP
 
-    def _measure_ping(self, ip):
         try:
-            param = '-n' if platform.system().lower() == 'windows' else '-c'
-            
-            # Using 9.9.9.9 which is designed to reply to pings
-            command = ['ping', param, '1', '-w', '1000', ip]
-            
-            startupinfo = None
-            if platform.system() == "Windows":
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            
-            output = subprocess.check_output(command, startupinfo=startupinfo, text=True)
-            
-            match = re.search(r"time[=<](\d+[\.]?\d*)", output)
-            if match:
-                return float(match.group(1))
-            return 0.0 
-        except Exception:
-            return 0.0
\ No newline at end of file
+            while self.running:
+                started = time.perf_counter()
+                await asyncio.gather(*(self._probe(name, *target) for name, target in self.targets.items()))
+                self.round_time = time.perf_counter() - started
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), max(0.0, self.interval - self.round_time))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for prober in self._icmp.values():
+                prober.close()
+
+    async def _resolve(self, host):
+        address = self._addresses.get(host)
+        if address is None:
+            try:
+                infos = await self.loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+            except OSError:
+                return None
+            address = self._addresses[host] = (infos[0][0], infos[0][4][0])
+        return address
+
+    async def _probe(self, name, method, host, port):
+        address = await self._resolve(host)
+        rtt = None
+        if address is not None:
+            family, ip = address
+            if method == "auto" and family in self._icmp:
+                method = "icmp"
+                rtt = await self._icmp[family].probe(ip, self.timeout)
+            else:
+                async with self._slots:
+                    if method == "udp":
+                        rtt = await udp_probe(ip, port, self.timeout)
+                    else:
+                        method = "tcp"
+                        rtt = await tcp_probe(ip, port or config.PING_TCP_PORT, self.timeout)
+
+        with self.lock:
+            stats = self.stats[name]
+            stats.method = method
+            stats.add(rtt)
+            self.pings[name] = rtt if rtt is not None else 0.0
@@ -0,0 +1,195 @@
+import os
+import socket
+import sys
+import time
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+
+# (file under <proc_root>/net, proto, address family)
+_TABLES = (("tcp", PROTO_TCP, socket.AF_INET), ("tcp6", PROTO_TCP, socket.AF_INET6),
+           ("udp", PROTO_UDP, socket.AF_INET), ("udp6", PROTO_UDP, socket.AF_INET6))
+
+
+def _decode_address(hex_ip, family):
+    # The kernel prints the address as native-endian 32-bit words
+    raw = bytes.fromhex(hex_ip)
+    if sys.byteorder == "little":
+        raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    ip = socket.inet_ntop(family, raw)
+    if ip.startswith("::ffff:") and "." in ip:
+        # IPv4-mapped sockets are matched against IPv4 packets
+        ip = ip[7:]
+    return ip
+
+
+def parse_socket_table(path, proto, family, addresses=None):
+    """
+    Yields (proto, local_ip, local_port, inode) for each socket in one of the
+    /proc/net/{tcp,tcp6,udp,udp6} files. Sockets no longer owned by a file
+    descriptor (inode 0, e.g. TIME_WAIT) are skipped. `addresses` caches
+    decoded addresses across calls: hosts have only a handful of local IPs.
+    """
+    if addresses is None:
+        addresses = {}
+    with open(path, "rb") as f:
+        f.readline()  # Header
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10 or fields[9] == b"0":
+                continue
+            hex_ip, _, hex_port = fields[1].partition(b":")
+            ip = addresses.get(hex_ip)
+            if ip is None:
+                ip = addresses[hex_ip] = _decode_address(hex_ip.decode(), family)
+            yield proto, ip, int(hex_port, 16), int(fields[9])
+
+
+class ProcNetTable:
+    """
+    Linux socket-to-process mapping straight from procfs: the socket tables
+    come from /proc/net/{tcp,tcp6,udp,udp6}, and an inode -> pid map is kept
+    across refreshes instead of rebuilt from every /proc/<pid>/fd each time
+    (which is what psutil.net_connections does).
+
+    Per refresh, only PIDs that appeared since the last one are scanned in full.
+    Sockets whose inode is still unknown then trigger a rescan of existing
+    PIDs, stopping as soon as every inode is found: first those whose fd count
+    changed (st_size of /proc/<pid>/fd, Linux 6.2+; one stat instead of a
+    readlink per fd), then those that just closed a socket, then owners of
+    sockets, then the rest.
+    Inodes that even that can't resolve (other users' processes without
+    privileges, other network namespaces) aren't looked for again while they last.
+    """
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+        self.inode_pids = {}  # inode -> pid
+        self.pid_inodes = {}  # pid -> set of socket inodes
+        self.pid_fd_counts = {}  # pid -> st_size of its fd directory when last scanned
+        self.unresolved = set()  # Inodes a full rescan couldn't place
+        self._addresses = {}
+        self.stats = {"refreshes": 0, "sockets": 0, "pids_scanned": 0, "full_rescans": 0,
+                      "last_refresh_ms": 0.0}
+
+    @staticmethod
+    def available(proc_root="/proc"):
+        return sys.platform.startswith("linux") and os.path.exists(os.path.join(proc_root, "net", "tcp"))
+
+    def sockets(self):
+        """[(proto, local_ip, local_port, inode), ...] across all four tables."""
+        found = []
+        for name, proto, family in _TABLES:
+            try:
+                found.extend(parse_socket_table(os.path.join(self.proc_root, "net", name), proto, family,
+                                                self._addresses))
+            except OSError:
+                continue  # e.g. no IPv6 support
+        return found
+
+    def connections(self):
+        """[(proto, local_ip, local_port, pid), ...] for every socket whose owner is known."""
+        start = time.perf_counter()
+        sockets = self.sockets()
+        self._update_pids({inode for _, _, _, inode in sockets})
+
+        inode_pids = self.inode_pids
+        result = []
+        for proto, ip, port, inode in sockets:
+            pid = inode_pids.get(inode)
+            if pid is not None:
+                result.append((proto, ip, port, pid))
+
+        self.stats["refreshes"] += 1
+        self.stats["sockets"] = len(sockets)
+        self.stats["last_refresh_ms"] = (time.perf_counter() - start) * 1000
+        return result
+
+    def _update_pids(self, live_inodes):
+        try:
+            pids = {int(entry) for entry in os.listdir(self.proc_root) if entry.isdigit()}
+        except OSError:
+            return
+
+        for pid in [pid for pid in self.pid_inodes if pid not in pids]:
+            self._forget(pid)
+        fresh = [pid for pid in pids if pid not in self.pid_inodes]
+        for pid in fresh:
+            self._scan(pid)
+
+        # Forget sockets that are gone (and fds that aren't inet sockets), so the map
+        # stays the size of the socket tables and a recycled inode is looked up afresh
+        closed_by = set()
+        for inode in self.inode_pids.keys() - live_inodes:
+            pid = self.inode_pids.pop(inode)
+            self.pid_inodes[pid].discard(inode)
+            closed_by.add(pid)
+        self.unresolved &= live_inodes
+
+        missing = live_inodes - self.inode_pids.keys() - self.unresolved
+        if not missing:
+            return
+        fresh = set(fresh)
+        candidates = [pid for pid in self.pid_inodes if pid not in fresh]
+        if not candidates:
+            self.unresolved |= missing
+            return
+        self.stats["full_rescans"] += 1
+        changed = []
+        for pid in candidates:
+            count = self._fd_count(pid)
+            if count is None or count != self.pid_fd_counts.get(pid):
+                changed.append(pid)
+        for pid in changed:
+            missing -= self._scan(pid)
+            if not missing:
+                return
+        # Same fd count can still hide a socket swapped for another: processes that
+        # just closed one are the likeliest, then those that already own sockets
+        changed = set(changed)
+        order = sorted((pid for pid in candidates if pid not in changed),
+                       key=lambda pid: (pid not in closed_by, not self.pid_inodes[pid]))
+        for pid in order:
+            missing -= self._scan(pid)
+            if not missing:
+                return
+        self.unresolved |= missing
+
+    def _fd_count(self, pid):
+        try:
+            return os.stat(os.path.join(self.proc_root, str(pid), "fd")).st_size
+        except OSError:
+            return None
+
+    def _scan(self, pid):
+        """Re-reads one PID's socket fds; returns its socket inodes."""
+        self.stats["pids_scanned"] += 1
+        fd_dir = os.path.join(self.proc_root, str(pid), "fd")
+        self.pid_fd_counts[pid] = self._fd_count(pid)
+        inodes = set()
+        try:
+            for fd in os.listdir(fd_dir):
+                try:
+                    target = os.readlink(os.path.join(fd_dir, fd))
+                except OSError:
+                    continue
+                if target.startswith("socket:["):
+                    inodes.add(int(target[8:-1]))
+        except OSError:
+            pass  # Exited, or not ours to read
+
+        previous = self.pid_inodes.get(pid)
+        if previous:
+            for inode in previous - inodes:
+                if self.inode_pids.get(inode) == pid:
+                    del self.inode_pids[inode]
+        for inode in inodes:
+            self.inode_pids[inode] = pid
+        self.pid_inodes[pid] = inodes
+        return inodes
+
+    def _forget(self, pid):
+        self.pid_fd_counts.pop(pid, None)
+        for inode in self.pid_inodes.pop(pid, ()):
+            if self.inode_pids.get(inode) == pid:
+                del self.inode_pids[inode]
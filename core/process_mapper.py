@@ -1,7 +1,18 @@
 import psutil
+from core.proc_net import ProcNetTable
+
+# Kept between calls, so its inode -> pid map is only updated incrementally
+_proc_net = ProcNetTable() if ProcNetTable.available() else None
+
 
 def get_process_by_ports(src_port, dst_port):
     try:
+        if _proc_net is not None:
+            for _proto, _ip, port, pid in _proc_net.connections():
+                if port in (src_port, dst_port):
+                    return psutil.Process(pid).name()
+            return "system"
+
         for conn in psutil.net_connections(kind="inet"):
             if not conn.laddr:
                 continue
@@ -0,0 +1,196 @@
+import re
+import threading
+import time
+import psutil
+from core import config
+
+ATTRIBUTION_MODES = ("name", "pid", "tree")
+# "chrome (1234)": the label of one process in "pid" mode
+_PID_LABEL = re.compile(r"^(.*) \((\d+)\)$")
+
+
+class ProcessInfo:
+    __slots__ = ("pid", "name", "ppid", "create_time", "_exe", "_cmdline")
+
+    def __init__(self, pid, name, ppid, create_time):
+        self.pid = pid
+        self.name = name
+        self.ppid = ppid
+        self.create_time = create_time
+        self._exe = None  # Fetched on first use: often needs more privileges
+        self._cmdline = None
+
+    @property
+    def exe(self):
+        if self._exe is None:
+            try:
+                self._exe = psutil.Process(self.pid).exe() or ""
+            except Exception:
+                self._exe = ""
+        return self._exe
+
+    @property
+    def cmdline(self):
+        if self._cmdline is None:
+            try:
+                self._cmdline = psutil.Process(self.pid).cmdline()
+            except Exception:
+                self._cmdline = []
+        return self._cmdline
+
+
+class ProcessRegistry:
+    """
+    Shared pid -> ProcessInfo cache with a name -> pids index, so attribution
+    and UI actions don't each walk psutil.process_iter.
+
+    refresh() is incremental: the pid list is diffed against the last one and
+    only new processes are read (name, ppid and start time, in one oneshot);
+    exe and cmdline are fetched lazily. A pid that was reused in between is
+    caught by verify(), which compares start times, and by resolve(), which
+    verifies before handing pids to an action.
+    """
+
+    def __init__(self, mode=None, max_age=2.0):
+        self.mode = mode or config.ATTRIBUTION_MODE
+        if self.mode not in ATTRIBUTION_MODES:
+            self.mode = "name"
+        self.max_age = max_age
+        self.processes = {}  # pid -> ProcessInfo
+        self.by_name = {}  # name -> set of pids
+        self.lock = threading.RLock()
+        self.refreshed_at = 0.0
+        self.stats = {"refreshes": 0, "added": 0, "removed": 0, "reused": 0, "last_refresh_ms": 0.0}
+
+    def refresh(self, max_age=None):
+        """Brings the table up to date unless it is younger than `max_age` seconds."""
+        max_age = self.max_age if max_age is None else max_age
+        if time.monotonic() - self.refreshed_at < max_age:
+            return
+        start = time.perf_counter()
+        try:
+            pids = set(psutil.pids())
+        except Exception:
+            return
+        with self.lock:
+            gone = [pid for pid in self.processes if pid not in pids]
+            for pid in gone:
+                self._remove(pid)
+            added = 0
+            for pid in pids:
+                if pid not in self.processes and self._add(pid) is not None:
+                    added += 1
+            self.refreshed_at = time.monotonic()
+            self.stats["refreshes"] += 1
+            self.stats["added"] += added
+            self.stats["removed"] += len(gone)
+            self.stats["last_refresh_ms"] = (time.perf_counter() - start) * 1000
+
+    def get(self, pid):
+        """Cached info for `pid`, read on a miss. None if there's no such process."""
+        with self.lock:
+            info = self.processes.get(pid)
+            if info is None:
+                info = self._add(pid)
+            return info
+
+    def verify(self, pid):
+        """Like get(), but re-reads the entry if the pid now belongs to a different process."""
+        with self.lock:
+            info = self.processes.get(pid)
+            if info is None:
+                return self._add(pid)
+            try:
+                create_time = psutil.Process(pid).create_time()
+            except Exception:
+                self._remove(pid)
+                return None
+            if create_time != info.create_time:
+                self.stats["reused"] += 1
+                self._remove(pid)
+                return self._add(pid)
+            return info
+
+    def pids_by_name(self, name):
+        with self.lock:
+            return sorted(self.by_name.get(name, ()))
+
+    def label(self, pid):
+        """The app name traffic from `pid` is attributed to, per the attribution mode."""
+        info = self.get(pid)
+        if info is None:
+            return None
+        if self.mode == "pid":
+            return f"{info.name} ({pid})"
+        if self.mode == "tree":
+            return self.tree_root(info).name
+        return info.name
+
+    def tree_root(self, info):
+        """
+        Highest ancestor running the same executable (or, when that can't be
+        read, with the same name): a browser's or editor's helper processes
+        roll up into their main process.
+        """
+        with self.lock:
+            seen = {info.pid}
+            while info.ppid and info.ppid not in seen:
+                parent = self.get(info.ppid)
+                if parent is None or parent.ppid == 0:
+                    break
+                if info.exe and parent.exe:
+                    same = parent.exe == info.exe
+                else:
+                    same = parent.name == info.name
+                if not same:
+                    break
+                seen.add(parent.pid)
+                info = parent
+            return info
+
+    def resolve(self, app_name):
+        """
+        Live, verified processes behind an app name as shown in the UI (a
+        process name, or a "name (pid)" label). For tree labels this is the
+        matching processes themselves; ending them ends their helpers too.
+        """
+        self.refresh()
+        match = _PID_LABEL.match(app_name)
+        if match:
+            info = self.verify(int(match.group(2)))
+            if info is not None and info.name == match.group(1):
+                return [info]
+        resolved = []
+        for pid in self.pids_by_name(app_name):
+            info = self.verify(pid)
+            if info is not None and info.name == app_name:
+                resolved.append(info)
+        if self.mode == "tree":
+            # Only the roots: ending a root takes its same-executable children with it
+            resolved = [info for info in resolved if self.tree_root(info) is info] or resolved
+        return resolved
+
+    def _add(self, pid):
+        try:
+            proc = psutil.Process(pid)
+            with proc.oneshot():
+                info = ProcessInfo(pid, proc.name(), proc.ppid(), proc.create_time())
+        except Exception:
+            return None
+        self.processes[pid] = info
+        self.by_name.setdefault(info.name, set()).add(pid)
+        return info
+
+    def _remove(self, pid):
+        info = self.processes.pop(pid, None)
+        if info is None:
+            return
+        pids = self.by_name.get(info.name)
+        if pids is not None:
+            pids.discard(pid)
+            if not pids:
+                del self.by_name[info.name]
+
+
+# Shared by attribution and the UI actions in this process
+registry = ProcessRegistry()
@@ -0,0 +1,233 @@
+import random
+import struct
+import time
+from core.capture import CaptureBackend, parse_ip_packet
+
+# Offline inputs for the capture pipeline: pcap/pcapng replay, a synthetic
+# generator and a deterministic stand-in for the socket index.
+
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6), b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9), b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+_PCAPNG_SHB = 0x0A0D0D0A
+
+
+def _link_offset(linktype, frame):
+    """Offset of the IP header for the link types we can replay, or None."""
+    if linktype == 1:  # Ethernet, with optional 802.1Q tags
+        offset = 12
+        while frame[offset:offset + 2] in (b"\x81\x00", b"\x88\xa8"):
+            offset += 4
+        return offset + 2
+    if linktype in (101, 12, 228, 229):  # Raw IP
+        return 0
+    if linktype == 113:  # Linux cooked (SLL)
+        return 16
+    if linktype == 276:  # Linux cooked v2 (SLL2)
+        return 20
+    if linktype == 0:  # BSD loopback
+        return 4
+    return None
+
+
+def read_pcap(path):
+    """Yields (timestamp, linktype, frame) from a pcap or pcapng file."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+        f.seek(0)
+        if magic in _PCAP_MAGIC:
+            yield from _read_pcap_classic(f)
+        elif struct.unpack("<I", magic)[0] == _PCAPNG_SHB:
+            yield from _read_pcapng(f)
+        else:
+            raise ValueError(f"{path} is not a pcap/pcapng file")
+
+
+def _read_pcap_classic(f):
+    header = f.read(24)
+    endian, resolution = _PCAP_MAGIC[header[:4]]
+    linktype = struct.unpack(endian + "I", header[20:24])[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + "IIII")
+    while True:
+        rec = f.read(record.size)
+        if len(rec) < record.size:
+            return
+        ts_sec, ts_frac, incl_len, _orig_len = record.unpack(rec)
+        frame = f.read(incl_len)
+        if len(frame) < incl_len:
+            return
+        yield ts_sec + ts_frac * resolution, linktype, frame
+
+
+def _read_pcapng(f):
+    endian = "<"
+    interfaces = []  # (linktype, ts_resolution)
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        block_type, block_len = struct.unpack(endian + "II", head)
+        if block_type == _PCAPNG_SHB:
+            bom = f.read(4)
+            endian = "<" if bom == b"\x4d\x3c\x2b\x1a" else ">"
+            block_len = struct.unpack(endian + "I", head[4:])[0]
+            f.seek(block_len - 12, 1)
+            interfaces = []
+            continue
+
+        body = f.read(block_len - 8)
+        if len(body) < block_len - 8:
+            return
+        if block_type == 1:  # Interface Description Block
+            linktype = struct.unpack_from(endian + "H", body, 0)[0]
+            interfaces.append((linktype, _pcapng_tsresol(body[8:-4], endian)))
+        elif block_type == 6:  # Enhanced Packet Block
+            if_id, ts_high, ts_low, cap_len, _orig_len = struct.unpack_from(endian + "IIIII", body, 0)
+            linktype, resolution = interfaces[if_id] if if_id < len(interfaces) else (1, 1e-6)
+            yield ((ts_high << 32) | ts_low) * resolution, linktype, body[20:20 + cap_len]
+        elif block_type == 3:  # Simple Packet Block
+            linktype = interfaces[0][0] if interfaces else 1
+            yield 0.0, linktype, body[4:-4]
+
+
+def _pcapng_tsresol(options, endian):
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack_from(endian + "HH", options, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:  # if_tsresol
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+class PcapReplayBackend(CaptureBackend):
+    """
+    Replays a capture file through the sniffer, either as fast as possible or
+    paced to the original timestamps. Each capture() call delivers at most
+    `chunk` packets so callers can drain between calls; `finished` turns True
+    at end of file.
+    """
+    name = "pcap"
+
+    def __init__(self, path, realtime=False, chunk=10000):
+        self.path = path
+        self.realtime = realtime
+        self.chunk = chunk
+        self.finished = False
+        self.packets = 0
+        self._reader = read_pcap(path)
+        self._first_ts = None
+        self._start = None
+
+    def capture(self, callback, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        parse = parse_ip_packet
+        for _ in range(self.chunk):
+            item = next(self._reader, None)
+            if item is None:
+                self.finished = True
+                return
+            ts, linktype, frame = item
+            offset = _link_offset(linktype, frame)
+            if offset is None:
+                continue
+            if self.realtime:
+                self._pace(ts)
+            rec = parse(frame, offset)
+            if rec is not None:
+                self.packets += 1
+                callback(*rec)
+            if time.monotonic() >= deadline:
+                return
+
+    def _pace(self, ts):
+        if self._first_ts is None:
+            self._first_ts, self._start = ts, time.monotonic()
+            return
+        delay = (ts - self._first_ts) - (time.monotonic() - self._start)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class SyntheticBackend(CaptureBackend):
+    """
+    Deterministic traffic generator: `flows` TCP/UDP conversations between
+    LOCAL_IP and remote hosts, `total` packets overall, optionally paced to `rate` pkt/s.
+    """
+    name = "synthetic"
+    LOCAL_IP = "192.168.1.10"
+
+    def __init__(self, total=1000000, flows=2000, rate=None, chunk=10000, seed=1):
+        self.total = total
+        self.rate = rate
+        self.chunk = chunk
+        self.finished = False
+        self.packets = 0
+        rnd = random.Random(seed)
+        self._rnd = rnd
+        self._flows = []
+        for i in range(flows):
+            remote = f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255 or 1}"
+            self._flows.append((6 if i % 3 else 17, remote, 32768 + i % 28000, rnd.choice((443, 80, 53, 8080))))
+        self._start = None
+
+    def capture(self, callback, timeout=1.0):
+        if self._start is None:
+            self._start = time.monotonic()
+        deadline = time.monotonic() + timeout
+        rnd = self._rnd
+        flows = self._flows
+        local = self.LOCAL_IP
+        for _ in range(self.chunk):
+            if self.packets >= self.total:
+                self.finished = True
+                return
+            proto, remote, lport, rport = flows[rnd.randrange(len(flows))]
+            size = rnd.randint(60, 1500)
+            flags = 0x10 if proto == 6 else 0  # Mid-connection TCP: ACK only
+            if rnd.random() < 0.5:
+                callback(proto, local, remote, lport, rport, size, flags)
+            else:
+                callback(proto, remote, local, rport, lport, size, flags)
+            self.packets += 1
+            if self.rate:
+                ahead = self.packets / self.rate - (time.monotonic() - self._start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            if time.monotonic() >= deadline:
+                return
+
+
+class StaticSocketIndex:
+    """
+    Deterministic stand-in for SocketIndex: any port on a local address belongs
+    to one of `apps` fake applications, chosen by port number. With
+    local_ips=None, every non-privileged port is treated as local.
+    """
+
+    def __init__(self, local_ips=(SyntheticBackend.LOCAL_IP,), apps=20):
+        self.local_ips = set(local_ips) if local_ips is not None else None
+        self.names = [f"app-{i:02d}" for i in range(apps)]
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def request_refresh(self):
+        pass
+
+    def lookup(self, proto, ip, port, fallback=True):
+        # Same signature as SocketIndex.lookup; every match here is exact, so `fallback` changes nothing
+        if self.local_ips is None:
+            if port < 1024:
+                return None
+        elif ip not in self.local_ips:
+            return None
+        index = port % len(self.names)
+        return (1000 + index, self.names[index])
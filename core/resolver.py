@@ -0,0 +1,129 @@
+import ipaddress
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from core.cache import TTLCache, MISSING
+
+
+class ReverseResolver:
+    """
+    Background reverse-DNS (PTR) lookups for remote endpoints.
+
+    lookup() and submit() never block: a cached name (or "" for a cached
+    failure) is returned right away, and a miss is queued on a small thread
+    pool. Each address is resolved at most once at a time, the queue is capped
+    at `max_pending`, and results land in a size-bounded TTL cache with a
+    shorter lifetime for failures. gethostbyaddr doesn't report record TTLs,
+    so `ttl` is a fixed upper bound on how long a name is trusted.
+
+    Resolved names are also collected for drain_resolved(), so the caller can
+    persist them on its own schedule.
+    """
+
+    def __init__(self, workers=4, max_size=8192, ttl=3600.0, negative_ttl=300.0, max_pending=1024,
+                 resolve=None):
+        self.cache = TTLCache(max_size=max_size, ttl=ttl, negative_ttl=negative_ttl)
+        self.lock = threading.Lock()  # Guards the cache, the in-flight set and the counters
+        self.inflight = set()
+        self.max_pending = max_pending
+        self.resolve = resolve or _gethostbyaddr
+        self.resolved = []  # (ip, hostname, resolved_at) waiting for drain_resolved()
+        self.counters = {"submitted": 0, "deduplicated": 0, "dropped": 0, "resolved": 0, "failed": 0,
+                         "lookup_ms_max": 0.0}
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolver")
+        self.running = True
+
+    def lookup(self, ip):
+        """The cached hostname, "" if the address has no name, or None while unknown (a lookup is queued)."""
+        with self.lock:
+            name = self._lookup_locked(ip)
+        return None if name is MISSING else name
+
+    def submit(self, ips):
+        """Queues lookups for every address not already cached or in flight. One lock round-trip for the batch."""
+        with self.lock:
+            for ip in ips:
+                self._lookup_locked(ip)
+
+    def names(self, ips):
+        """{ip: hostname} for the addresses with a cached name; misses are queued."""
+        found = {}
+        with self.lock:
+            for ip in ips:
+                name = self._lookup_locked(ip)
+                if name:
+                    found[ip] = name
+        return found
+
+    def drain_resolved(self):
+        with self.lock:
+            resolved = self.resolved
+            self.resolved = []
+        return resolved
+
+    def stats(self):
+        with self.lock:
+            stats = self.cache.stats()
+            stats.update(self.counters)
+            stats["pending"] = len(self.inflight)
+            stats["max_pending"] = self.max_pending
+        return stats
+
+    def close(self):
+        self.running = False
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def _lookup_locked(self, ip):
+        name = self.cache.get(ip)
+        if name is not MISSING:
+            return name
+        if ip in self.inflight:
+            self.counters["deduplicated"] += 1
+            return MISSING
+        if not _resolvable(ip):
+            self.cache.put(ip, "", negative=True)
+            return ""
+        if not self.running:
+            return MISSING
+        if len(self.inflight) >= self.max_pending:
+            # Retried on a later sighting, once the backlog has drained
+            self.counters["dropped"] += 1
+            return MISSING
+        self.inflight.add(ip)
+        self.counters["submitted"] += 1
+        self.pool.submit(self._resolve, ip)
+        return MISSING
+
+    def _resolve(self, ip):
+        start = time.perf_counter()
+        try:
+            name = self.resolve(ip)
+        except Exception:
+            name = None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.inflight.discard(ip)
+            if elapsed_ms > self.counters["lookup_ms_max"]:
+                self.counters["lookup_ms_max"] = elapsed_ms
+            if name:
+                self.cache.put(ip, name)
+                if len(self.resolved) < self.cache.max_size:
+                    self.resolved.append((ip, name, time.time()))
+                self.counters["resolved"] += 1
+            else:
+                self.cache.put(ip, "", negative=True)
+                self.counters["failed"] += 1
+
+
+def _gethostbyaddr(ip):
+    return socket.gethostbyaddr(ip)[0]
+
+
+def _resolvable(ip):
+    # Skips overflow/"other" placeholders ("*") and addresses no PTR record exists for
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return not (address.is_unspecified or address.is_multicast or address.is_reserved)
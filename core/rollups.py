@@ -0,0 +1,208 @@
+import time
+
+# Downsampling tiers for instance_logs: (name, table, bucket seconds).
+# Each tier is built from the one before it; "raw" is instance_logs itself.
+TIERS = [
+    ("raw", "instance_logs", 1),
+    ("1m", "rollup_1m", 60),
+    ("1h", "rollup_1h", 3600),
+    ("1d", "rollup_1d", 86400),
+]
+
+# Rows newer than this are left alone, so late writes from the queue still land in raw
+SETTLE_SECONDS = 5
+# Most time rolled up per tier per pass, to keep each transaction short on a big backlog
+MAX_ROLLUP_SPAN = 6 * 3600
+DELETE_BATCH = 5000
+
+
+def ensure_schema(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(instance_logs)")}
+    # Older databases only stored speeds; bytes are needed for exact rollups
+    if "download_bytes" not in columns:
+        conn.execute("ALTER TABLE instance_logs ADD COLUMN download_bytes INTEGER")
+        conn.execute("ALTER TABLE instance_logs ADD COLUMN upload_bytes INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_timestamp ON instance_logs (timestamp)")
+
+    for _name, table, _size in TIERS[1:]:
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket INTEGER,
+                app_name TEXT,
+                src_ip TEXT,
+                dst_ip TEXT,
+                download_bytes INTEGER,
+                upload_bytes INTEGER,
+                PRIMARY KEY (bucket, app_name, src_ip, dst_ip)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_app ON {table} (app_name, bucket)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            tier TEXT PRIMARY KEY,
+            watermark REAL
+        )
+    """)
+
+
+def get_watermarks(conn):
+    """Per tier: everything before this timestamp has been rolled into the tier."""
+    return dict(conn.execute("SELECT tier, watermark FROM rollup_state").fetchall())
+
+
+def _set_watermark(conn, tier, value):
+    conn.execute("INSERT OR REPLACE INTO rollup_state (tier, watermark) VALUES (?, ?)", (tier, value))
+
+
+def _first_at_or_after(conn, tier_index, value):
+    name, table, _size = TIERS[tier_index]
+    column = "timestamp" if name == "raw" else "bucket"
+    return conn.execute(f"SELECT MIN({column}) FROM {table} WHERE {column} >= ?", (value,)).fetchone()[0]
+
+
+def run_rollups(conn, now=None, max_chunks=8):
+    """Rolls each tier forward from the one below it. Returns rows written."""
+    now = now or time.time()
+    watermarks = get_watermarks(conn)
+    written = 0
+
+    for index in range(1, len(TIERS)):
+        src_name, src_table, _src_size = TIERS[index - 1]
+        name, table, size = TIERS[index]
+        # A tier can only be complete up to where its source is complete
+        src_limit = now - SETTLE_SECONDS if src_name == "raw" else watermarks.get(src_name)
+        if src_limit is None:
+            continue
+        target = (int(src_limit) // size) * size
+
+        if src_name == "raw":
+            select = f"""
+                SELECT CAST(timestamp / {size} AS INTEGER) * {size}, app_name, src_ip, dst_ip,
+                       SUM(COALESCE(download_bytes, download_speed * 1024)),
+                       SUM(COALESCE(upload_bytes, upload_speed * 1024))
+                FROM instance_logs
+                WHERE timestamp >= ? AND timestamp < ?
+                GROUP BY 1, 2, 3, 4
+            """
+        else:
+            select = f"""
+                SELECT (bucket / {size}) * {size}, app_name, src_ip, dst_ip,
+                       SUM(download_bytes), SUM(upload_bytes)
+                FROM {src_table}
+                WHERE bucket >= ? AND bucket < ?
+                GROUP BY 1, 2, 3, 4
+            """
+
+        start = watermarks.get(name, 0)
+        for _ in range(max_chunks):
+            if start >= target:
+                break
+            # Skip empty stretches (e.g. the app wasn't running) in one step
+            first = _first_at_or_after(conn, index - 1, start)
+            if first is None or first >= target:
+                start = target
+                with conn:
+                    _set_watermark(conn, name, start)
+                break
+            start = max(start, (int(first) // size) * size)
+            upto = min(target, start + max(MAX_ROLLUP_SPAN, size))
+
+            with conn:
+                cur = conn.execute(f"""
+                    INSERT INTO {table} (bucket, app_name, src_ip, dst_ip, download_bytes, upload_bytes)
+                    {select}
+                    ON CONFLICT (bucket, app_name, src_ip, dst_ip) DO UPDATE SET
+                        download_bytes = download_bytes + excluded.download_bytes,
+                        upload_bytes = upload_bytes + excluded.upload_bytes
+                """, (start, upto))
+                _set_watermark(conn, name, upto)
+            written += max(cur.rowcount, 0)
+            start = upto
+        watermarks[name] = start
+    return written
+
+
+def run_retention(conn, retention, now=None, max_batches=10):
+    """
+    Deletes expired rows in batches of DELETE_BATCH, at most `max_batches` per
+    call so the writer thread is never held for long. Data is only deleted
+    once the next tier has absorbed it. `retention` maps tier -> seconds (0 = keep).
+    Returns rows deleted.
+    """
+    now = now or time.time()
+    watermarks = get_watermarks(conn)
+    deleted = 0
+    batches = 0
+
+    for index, (name, table, _size) in enumerate(TIERS):
+        keep = retention.get(name) or 0
+        if not keep:
+            continue
+        cutoff = now - keep
+        if index + 1 < len(TIERS):
+            rolled = watermarks.get(TIERS[index + 1][0])
+            if rolled is None:
+                continue
+            cutoff = min(cutoff, rolled)
+
+        if name == "raw":
+            sql = f"""
+                DELETE FROM instance_logs WHERE id IN (
+                    SELECT id FROM instance_logs WHERE timestamp < ? LIMIT {DELETE_BATCH}
+                )
+            """
+        else:
+            # WITHOUT ROWID tables: select the batch by primary key
+            sql = f"""
+                DELETE FROM {table} WHERE (bucket, app_name, src_ip, dst_ip) IN (
+                    SELECT bucket, app_name, src_ip, dst_ip FROM {table} WHERE bucket < ? LIMIT {DELETE_BATCH}
+                )
+            """
+        while batches < max_batches:
+            with conn:
+                count = conn.execute(sql, (cutoff,)).rowcount
+            batches += 1
+            deleted += count
+            if count < DELETE_BATCH:
+                break
+    return deleted
+
+
+def history_segments(start, end, resolution, watermarks, retention, now=None):
+    """
+    Plans a historical query: [(tier_index, lo, hi), ...] covering [start, end).
+    Uses the coarsest tier whose buckets fit `resolution` and whose retention
+    still covers `start` (or the finest tier covering `start` if none fit); the
+    part newer than that tier's watermark is read from finer tiers.
+    """
+    now = now or time.time()
+    usable = []
+    for index, (name, _table, _size) in enumerate(TIERS):
+        keep = retention.get(name) or 0
+        if keep and start < now - keep:
+            continue
+        if index and watermarks.get(name) is None:
+            continue
+        usable.append(index)
+
+    fitting = [index for index in usable if TIERS[index][2] <= resolution]
+    if fitting:
+        chosen = fitting[-1]
+    else:
+        # Nothing that fine still covers `start`: fall back to the finest tier that does
+        chosen = usable[0] if usable else 0
+
+    segments = []
+    hi = end
+    # Walk down from the chosen tier, each one serving up to its watermark
+    for index in range(chosen, 0, -1):
+        mark = watermarks.get(TIERS[index][0])
+        if mark is None or mark <= start:
+            continue
+        mark = min(mark, hi)
+        segments.append((index, start, mark))
+        start = mark
+        if start >= hi:
+            return segments
+    segments.append((0, start, hi))
+    return segments
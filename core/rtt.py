@@ -0,0 +1,153 @@
+import heapq
+import time
+from collections import OrderedDict, deque
+from core.cache import TTLCache, MISSING
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+# Handshake retransmits wait for an RTO (200 ms at the very least), so a repeat
+# sooner than this is the same packet captured twice (e.g. on loopback)
+DUPLICATE_WINDOW = 0.05
+
+
+class HandshakeTracker:
+    """
+    Passive RTT from TCP handshakes: remembers when each SYN was seen and, when
+    the handshake's final ACK passes, reports SYN -> ACK as one round trip
+    (at an end host one leg of it is local, so this is the path RTT).
+
+    Pending handshakes live in an insertion-ordered table capped at
+    `max_pending`; entries older than `timeout` are evicted from the front.
+    Handshakes with a retransmitted SYN or SYN/ACK are discarded (Karn's rule).
+    Not thread-safe: call it from the capture thread only.
+    """
+
+    def __init__(self, max_pending=4096, timeout=5.0, clock=time.monotonic):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.clock = clock
+        # (client_ip, client_port, server_ip, server_port) -> [syn_time, synack_time, retransmitted]
+        self.pending = OrderedDict()
+        self.stats = {"samples": 0, "retransmits": 0, "timeouts": 0, "overflows": 0, "resets": 0}
+
+    def observe(self, src_ip, dst_ip, sport, dport, flags):
+        """Feeds one TCP packet. Returns the handshake RTT in ms when this packet completes one."""
+        pending = self.pending
+        if flags & TCP_SYN:
+            if flags & TCP_ACK:
+                entry = pending.get((dst_ip, dport, src_ip, sport))
+                if entry is not None:
+                    now = self.clock()
+                    if entry[1] is None:
+                        entry[1] = now
+                    elif now - entry[1] > DUPLICATE_WINDOW:
+                        entry[2] = True
+                        self.stats["retransmits"] += 1
+                return None
+
+            key = (src_ip, sport, dst_ip, dport)
+            now = self.clock()
+            entry = pending.get(key)
+            if entry is not None:
+                if now - entry[0] > DUPLICATE_WINDOW:
+                    entry[2] = True
+                    self.stats["retransmits"] += 1
+                return None
+            self.expire(now)
+            if len(pending) >= self.max_pending:
+                pending.popitem(last=False)
+                self.stats["overflows"] += 1
+            pending[key] = [now, None, False]
+            return None
+
+        if not pending:
+            return None
+        key = (src_ip, sport, dst_ip, dport)
+        entry = pending.get(key)
+        if entry is None:
+            return None
+        if flags & TCP_RST:
+            del pending[key]
+            self.stats["resets"] += 1
+            return None
+        if not (flags & TCP_ACK) or entry[1] is None:
+            return None
+        del pending[key]
+        if entry[2]:
+            return None
+        self.stats["samples"] += 1
+        return (self.clock() - entry[0]) * 1000
+
+    def expire(self, now=None):
+        now = self.clock() if now is None else now
+        pending = self.pending
+        limit = now - self.timeout
+        while pending:
+            key, entry = next(iter(pending.items()))
+            if entry[0] > limit:
+                break
+            del pending[key]
+            self.stats["timeouts"] += 1
+
+
+class LatencyStats:
+    """Latency distribution over the most recent `size` samples, plus lifetime count and min."""
+
+    def __init__(self, size=256):
+        self.samples = deque(maxlen=size)
+        self.count = 0
+        self.min = None
+
+    def add(self, rtt):
+        self.samples.append(rtt)
+        self.count += 1
+        if self.min is None or rtt < self.min:
+            self.min = rtt
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        pick = lambda q: ordered[min(n - 1, int(q / 100 * n))] if n else None
+        return {"count": self.count, "min": self.min, "p50": pick(50), "p95": pick(95), "p99": pick(99)}
+
+
+class LatencyTable:
+    """
+    Handshake RTT distributions per app and per (app, remote address).
+    Destinations are kept in a TTLCache so long-running captures don't grow
+    without bound.
+    """
+
+    def __init__(self, max_destinations=2048, destination_ttl=3600.0):
+        self.apps = {}
+        self.destinations = TTLCache(max_size=max_destinations, ttl=destination_ttl)
+
+    def add_samples(self, samples):
+        for app_name, remote_ip, rtt in samples:
+            stats = self.apps.get(app_name)
+            if stats is None:
+                stats = self.apps[app_name] = LatencyStats()
+            stats.add(rtt)
+
+            key = (app_name, remote_ip)
+            stats = self.destinations.get(key)
+            if stats is MISSING:
+                stats = LatencyStats()
+            # put() also refreshes the entry's TTL
+            self.destinations.put(key, stats)
+            stats.add(rtt)
+
+    def app_summary(self):
+        return {app_name: stats.summary() for app_name, stats in self.apps.items()}
+
+    def destination_summary(self, per_app=3):
+        """{app_name: [(remote_ip, summary), ...]}: each app's `per_app` destinations with the most samples."""
+        by_app = {}
+        for (app_name, remote_ip), stats in self.destinations.items():
+            by_app.setdefault(app_name, []).append((stats.count, remote_ip, stats))
+        return {app_name: [(remote_ip, stats.summary())
+                           for _count, remote_ip, stats in heapq.nlargest(per_app, entries)]
+                for app_name, entries in by_app.items()}
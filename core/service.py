@@ -0,0 +1,141 @@
+import threading
+import time
+import psutil
+from core import config
+from core.packet_sniffer import PacketSniffer
+from core.capture_process import ProcessSniffer
+from core.aggregator import TrafficAggregator
+from core.pinger import NetworkPinger
+from core.rtt import LatencyTable
+
+
+class MonitorService:
+    """
+    Owns the sniffer, aggregator, pinger, database and cloud sync and drives
+    them from its own scheduler thread. Front-ends (the Kivy GUI, the headless
+    daemon) only read the latest snapshot. Nothing here imports Kivy.
+    """
+
+    def __init__(self, tick_interval=1.0, save_interval=5.0, top_k=10):
+        self.tick_interval = tick_interval
+        self.save_interval = save_interval
+        self.top_k = top_k
+        self.running = False
+        self.lock = threading.Lock()
+        self.snapshot = {"seq": 0, "ts": 0.0, "rates": {}, "download_kb": 0.0, "upload_kb": 0.0, "pings": {}, "ping_stats": {}, "rtt": {}, "rtt_destinations": {}, "top": [], "talkers": {}, "sketch": {},
+                         "resolver": {}, "capture": {}}
+        self.sniffer = None
+        self.aggregator = None
+        self.pinger = None
+        self.latency = LatencyTable()
+
+    def start(self):
+        # 1. Start Sniffer
+        if config.CAPTURE_MODE == "process":
+            self.sniffer = ProcessSniffer()
+        else:
+            self.sniffer = PacketSniffer()
+        self.sniffer.start()
+
+        # 2. Start Aggregator (database + cloud client)
+        self.aggregator = TrafficAggregator()
+
+        # 3. Start Pinger
+        self.pinger = NetworkPinger()
+        self.pinger.start()
+
+        self.last_net_io = psutil.net_io_counters()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if hasattr(self, "thread"):
+            self.thread.join(timeout=self.tick_interval * 2)
+        if self.sniffer: self.sniffer.stop()
+        if self.aggregator:
+            self.aggregator.save_data()
+            self.aggregator.db.close()  # Drains the write queue before exiting
+            self.aggregator.cloud.close()
+            if self.aggregator.resolver: self.aggregator.resolver.close()
+        if self.pinger: self.pinger.stop()
+
+    def get_snapshot(self):
+        with self.lock:
+            return self.snapshot
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick_interval
+        next_save = time.monotonic() + self.save_interval
+        while self.running:
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            if not self.running:
+                break
+            try:
+                self._tick()
+                now = time.monotonic()
+                if now >= next_save:
+                    self.aggregator.save_data()
+                    next_save = now + self.save_interval
+            except Exception as e:
+                print(f"Service Error: {e}")
+            # Skip missed ticks instead of bursting to catch up
+            next_tick = max(next_tick + self.tick_interval, time.monotonic())
+
+    def _destination_latency(self):
+        """{app_name: [(remote_ip, hostname or None, summary), ...]} for each app's busiest destinations."""
+        summary = self.latency.destination_summary()
+        names = self.aggregator.hostnames({ip for entries in summary.values() for ip, _stats in entries})
+        return {app_name: [(ip, names.get(ip), stats) for ip, stats in entries]
+                for app_name, entries in summary.items()}
+
+    def _top_talkers(self, top, per_app=3):
+        """
+        {app_name: [(remote_ip, hostname or None, down, up, error), ...]}: the top
+        apps' busiest destinations over the sketch window (empty unless SKETCH_TOP_K > 0).
+        """
+        talkers = {}
+        for app_name, _down, _up in top:
+            entries = self.aggregator.top_talkers(app_name)[:per_app]
+            if entries:
+                talkers[app_name] = entries
+        if not talkers:
+            return {}
+        names = self.aggregator.hostnames({ip for entries in talkers.values() for ip, *_counts in entries})
+        return {app_name: [(ip, names.get(ip), down, up, error) for ip, down, up, error in entries]
+                for app_name, entries in talkers.items()}
+
+    def _tick(self):
+        traffic_data = self.sniffer.get_traffic_data()
+        rates = self.aggregator.calculate_rates(traffic_data)
+        self.latency.add_samples(self.sniffer.get_rtt_samples())
+
+        # Hardware counters give the accurate interface totals for the main graph
+        current_net_io = psutil.net_io_counters()
+        download_kb = (current_net_io.bytes_recv - self.last_net_io.bytes_recv) / 1024
+        upload_kb = (current_net_io.bytes_sent - self.last_net_io.bytes_sent) / 1024
+        self.last_net_io = current_net_io
+
+        top = self.aggregator.top_apps(self.top_k)
+        snapshot = {
+            "seq": self.snapshot["seq"] + 1,
+            "ts": time.time(),
+            "rates": rates,  # Active apps only
+            "top": top,
+            "talkers": self._top_talkers(top),
+            "sketch": self.aggregator.get_sketch_stats(),
+            "download_kb": download_kb,
+            "upload_kb": upload_kb,
+            "pings": self.pinger.get_pings(),
+            "ping_stats": self.pinger.get_stats(),
+            "rtt": self.latency.app_summary(),
+            "rtt_destinations": self._destination_latency(),
+            "resolver": self.aggregator.get_resolver_stats(),
+            "capture": self.sniffer.get_capture_stats(),
+        }
+        # Snapshots are replaced, never mutated, so readers can hold on to them
+        with self.lock:
+            self.snapshot = snapshot
@@ -0,0 +1,115 @@
+import struct
+from multiprocessing import shared_memory
+
+# Layout: [header][capacity * record]. One producer and one consumer;
+# write_seq / dropped / overruns are only written by the producer and
+# read_seq only by the consumer, so no cross-process lock is needed.
+_HEADER = struct.Struct("<QQQQQ")  # capacity, write_seq, read_seq, dropped, overruns
+# proto, sport, dport, app_name, src_ip, dst_ip, down, up, packets (ports without one are 0)
+_RECORD = struct.Struct("<BxHH64s46s46sxxQQQ")
+
+_CAPACITY, _WRITE, _READ, _DROPPED, _OVERRUNS = (i * 8 for i in range(5))
+_U64 = struct.Struct("<Q")
+
+
+def _encode(text, size):
+    return text.encode("utf-8", "ignore")[:size]
+
+
+def _decode(raw):
+    return raw.rstrip(b"\0").decode("utf-8", "ignore")
+
+
+class ShmRing:
+    """
+    Fixed-size record ring buffer in multiprocessing.shared_memory.
+    Records are flow deltas as returned by PacketSniffer.get_traffic_data():
+    (proto, src_ip, sport, dst_ip, dport, app_name, down_bytes, up_bytes, packets).
+    When the consumer falls behind, new records are dropped (never overwritten)
+    and counted.
+    """
+    record_size = _RECORD.size
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        self.capacity = _U64.unpack_from(self.buf, _CAPACITY)[0]
+
+    @classmethod
+    def create(cls, capacity=65536):
+        shm = shared_memory.SharedMemory(create=True, size=_HEADER.size + capacity * _RECORD.size)
+        _HEADER.pack_into(shm.buf, 0, capacity, 0, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _get(self, offset):
+        return _U64.unpack_from(self.buf, offset)[0]
+
+    def _set(self, offset, value):
+        _U64.pack_into(self.buf, offset, value)
+
+    # --- Producer side ---
+    def push_many(self, records):
+        """Writes as many records as fit; returns how many were written."""
+        buf = self.buf
+        capacity = self.capacity
+        write_seq = self._get(_WRITE)
+        free = capacity - (write_seq - self._get(_READ))
+        written = 0
+        dropped = 0
+
+        for proto, src_ip, sport, dst_ip, dport, app_name, down, up, packets in records:
+            if written >= free:
+                dropped += 1
+                continue
+            offset = _HEADER.size + ((write_seq + written) % capacity) * _RECORD.size
+            _RECORD.pack_into(buf, offset, proto, sport or 0, dport or 0, _encode(app_name, 64),
+                              _encode(src_ip, 46), _encode(dst_ip, 46), down, up, packets)
+            written += 1
+
+        # Publish only after the records themselves are in place
+        self._set(_WRITE, write_seq + written)
+        if dropped:
+            self._set(_DROPPED, self._get(_DROPPED) + dropped)
+            self._set(_OVERRUNS, self._get(_OVERRUNS) + 1)
+        return written
+
+    # --- Consumer side ---
+    def pop_all(self):
+        buf = self.buf
+        capacity = self.capacity
+        read_seq = self._get(_READ)
+        write_seq = self._get(_WRITE)
+        records = []
+        for seq in range(read_seq, write_seq):
+            offset = _HEADER.size + (seq % capacity) * _RECORD.size
+            proto, sport, dport, app_name, src_ip, dst_ip, down, up, packets = _RECORD.unpack_from(buf, offset)
+            records.append((proto, _decode(src_ip), sport, _decode(dst_ip), dport, _decode(app_name),
+                            down, up, packets))
+        self._set(_READ, write_seq)
+        return records
+
+    def stats(self):
+        write_seq = self._get(_WRITE)
+        read_seq = self._get(_READ)
+        return {
+            "capacity": self.capacity,
+            "depth": write_seq - read_seq,
+            "written": write_seq,
+            "dropped": self._get(_DROPPED),
+            "overruns": self._get(_OVERRUNS),
+        }
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,148 @@
+import math
+from array import array
+
+# Key under which everything outside the top-k is reported
+OTHER = "*"
+
+
+class CountMinSketch:
+    """
+    Approximate byte counts per key in fixed memory (`depth` rows of `width`
+    counters). Estimates never undercount; with probability 1 - e^-depth they
+    overcount by at most e / width of everything added since the last reset.
+    """
+
+    def __init__(self, width=2048, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = array("q", bytes(8 * width * depth))
+        self.total = 0
+
+    def _slots(self, key):
+        # Double hashing: the two halves of one 64-bit hash give `depth` independent-enough indexes
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def add(self, key, amount):
+        """Adds `amount` and returns the key's new estimate."""
+        table = self.table
+        width = self.width
+        self.total += amount
+        # Same indexes as _slots(), inlined: this is the per-key hot path
+        h = hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        estimate = None
+        for row in range(self.depth):
+            slot = row * width + (h1 + row * h2) % width
+            value = table[slot] + amount
+            table[slot] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, key):
+        table = self.table
+        return min(table[slot] for slot in self._slots(key))
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def error_bound(self):
+        """Largest overcount of any estimate (bytes), with probability 1 - delta."""
+        return self.epsilon * self.total
+
+    def reset(self):
+        self.table = array("q", bytes(8 * self.width * self.depth))
+        self.total = 0
+
+
+class HeavyHitters:
+    """
+    The top `k` keys by bytes within each group (e.g. per app), in fixed memory
+    per group: a Count-Min sketch shared by all groups counts every key, and a
+    Space-Saving style summary keeps only the k keys with the largest estimates.
+
+    Down/up bytes of a tracked key are exact from the moment it entered the top-k;
+    its earlier bytes stay in the group's "other" remainder, so a group's top()
+    rows plus other() always add up to exactly what was added for it. Tracked
+    keys bypass the sketch: their estimate grows by exactly what is added.
+    """
+
+    def __init__(self, k=20, width=2048, depth=4):
+        self.k = k
+        self.cms = CountMinSketch(width, depth)
+        # group -> [{key: [estimate, down, up]}, floor, down, up]: the tracked keys,
+        # a lower bound of their smallest estimate, and the group's exact totals
+        self.groups = {}
+        self.evictions = 0
+
+    def add(self, group, key, down, up):
+        state = self.groups.get(group)
+        if state is None:
+            state = self.groups[group] = [{}, 0, 0, 0]
+        state[2] += down
+        state[3] += up
+
+        entries = state[0]
+        entry = entries.get(key)
+        if entry is not None:
+            entry[0] += down + up
+            entry[1] += down
+            entry[2] += up
+            return
+        estimate = self.cms.add((group, key), down + up)
+        if len(entries) < self.k:
+            entries[key] = [estimate, down, up]
+            return
+        # Estimates only grow, so the cached floor is a cheap filter for the long tail
+        if estimate <= state[1]:
+            return
+        smallest = min(entries, key=lambda name: entries[name][0])
+        if estimate > entries[smallest][0]:
+            # Hand the evicted key's tracked bytes back to the sketch, so its estimate stays an upper bound
+            evicted = entries.pop(smallest)
+            self.cms.add((group, smallest), evicted[1] + evicted[2])
+            entries[key] = [estimate, down, up]
+            self.evictions += 1
+            smallest = min(entries, key=lambda name: entries[name][0])
+        state[1] = entries[smallest][0]
+
+    def top(self, group):
+        """[(key, down, up, error), ...] largest first; the key's true bytes lie in [down + up, down + up + error]."""
+        state = self.groups.get(group)
+        entries = state[0] if state is not None else {}
+        ranked = sorted(entries.items(), key=lambda item: item[1][0], reverse=True)
+        return [(key, down, up, estimate - down - up) for key, (estimate, down, up) in ranked]
+
+    def other(self, group):
+        """(down, up) of the group not attributed to its top-k keys."""
+        state = self.groups.get(group)
+        if state is None:
+            return 0, 0
+        entries = state[0].values()
+        return state[2] - sum(e[1] for e in entries), state[3] - sum(e[2] for e in entries)
+
+    def stats(self):
+        return {
+            "k": self.k,
+            "groups": len(self.groups),
+            "tracked": sum(len(state[0]) for state in self.groups.values()),
+            "evictions": self.evictions,
+            "sketched_bytes": self.cms.total,
+            "epsilon": self.cms.epsilon,
+            "delta": self.cms.delta,
+            "error_bound_bytes": self.cms.error_bound(),
+        }
+
+    def reset(self):
+        self.cms.reset()
+        self.groups = {}
@@ -0,0 +1,157 @@
+import socket
+import threading
+import time
+import psutil
+from core.proc_net import ProcNetTable, PROTO_TCP, PROTO_UDP
+from core import process_registry
+
+_SOCK_PROTO = {socket.SOCK_STREAM: PROTO_TCP, socket.SOCK_DGRAM: PROTO_UDP}
+_WILDCARD_IPS = ("0.0.0.0", "::")
+
+
+class SocketIndex:
+    """
+    Background-refreshed map of local sockets to their owning process.
+
+    One connection snapshot is taken per refresh interval and diffed against
+    the previous one, so lookups on the packet path are plain dict reads and
+    never touch psutil.
+    On Linux the snapshot is read from /proc/net (see core.proc_net) rather
+    than psutil.net_connections; elsewhere, or when procfs isn't usable, psutil.
+    Names come from the process registry, so they follow its attribution mode.
+    Key: (proto, local_ip, local_port), Value: (pid, name)
+
+    Wildcard listeners and port-only matches are only used for addresses of
+    this host (`local_ips`), so a remote endpoint's port never matches a
+    local server listening on the same port.
+    """
+
+    def __init__(self, refresh_interval=1.0, min_refresh_gap=0.2, proc_root="/proc", registry=None):
+        self.refresh_interval = refresh_interval
+        self.min_refresh_gap = min_refresh_gap
+        self.running = False
+        self.table = {}
+        self.by_port = {}  # Key: (proto, local_port) -> (pid, name)
+        self.local_ips = frozenset()  # Replaced, never mutated: read from the capture thread
+        self.registry = registry if registry is not None else process_registry.registry
+        self._wake = threading.Event()
+        self._last_refresh = 0.0
+        self.proc_net = ProcNetTable(proc_root) if ProcNetTable.available(proc_root) else None
+        self.stats = {"refreshes": 0, "added": 0, "removed": 0, "last_refresh_ms": 0.0}
+
+    def start(self):
+        self.running = True
+        self.refresh()
+        self.thread = threading.Thread(target=self._refresh_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake.set()
+
+    def lookup(self, proto, ip, port, fallback=True):
+        """
+        O(1) lookup used from the capture thread. Returns (pid, name) or None.
+        With `fallback`, a miss on a local address tries the wildcard listener
+        and then any socket on that port.
+        """
+        hit = self.table.get((proto, ip, port))
+        if hit is None and fallback and ip in self.local_ips:
+            hit = self.table.get((proto, _WILDCARD_IPS[":" in ip], port))
+            if hit is None:
+                hit = self.by_port.get((proto, port))
+        return hit
+
+    def request_refresh(self):
+        """Asks the background thread for an early snapshot (e.g. after a miss)."""
+        self._wake.set()
+
+    def _refresh_loop(self):
+        while self.running:
+            self._wake.wait(self.refresh_interval)
+            self._wake.clear()
+            if not self.running:
+                break
+            gap = time.monotonic() - self._last_refresh
+            if gap < self.min_refresh_gap:
+                time.sleep(self.min_refresh_gap - gap)
+            self.refresh()
+
+    def refresh(self):
+        start = time.perf_counter()
+        try:
+            conns = self._connections()
+        except Exception:
+            return
+        self._last_refresh = time.monotonic()
+
+        registry = self.registry
+        registry.refresh()
+        snapshot = {}
+        snapshot_ports = {}
+        labels = {}  # pid -> name, once per refresh
+        local_ips = self._interface_ips()
+        for proto, ip, port, pid in conns:
+            local_ips.add(ip)
+            name = labels.get(pid)
+            if name is None:
+                known = self.table.get((proto, ip, port))
+                if known is None or known[0] != pid:
+                    # A socket we haven't seen with this owner: make sure the pid wasn't reused
+                    registry.verify(pid)
+                name = labels[pid] = registry.label(pid) or ""
+            if not name:
+                continue
+            value = (pid, name)
+            snapshot[(proto, ip, port)] = value
+            snapshot_ports[(proto, port)] = value
+
+        # Apply the diff in place: the capture thread keeps reading the same dicts
+        added, removed = self._apply_diff(self.table, snapshot)
+        self._apply_diff(self.by_port, snapshot_ports)
+        local_ips.difference_update(_WILDCARD_IPS)
+        if local_ips != self.local_ips:
+            self.local_ips = frozenset(local_ips)
+
+        self.stats["refreshes"] += 1
+        self.stats["added"] += added
+        self.stats["removed"] += removed
+        self.stats["last_refresh_ms"] = (time.perf_counter() - start) * 1000
+
+    def _connections(self):
+        """[(proto, local_ip, local_port, pid), ...]"""
+        if self.proc_net is not None:
+            return self.proc_net.connections()
+        conns = []
+        for c in psutil.net_connections(kind="inet"):
+            if not c.laddr or not c.pid:
+                continue
+            proto = _SOCK_PROTO.get(c.type)
+            if proto is not None:
+                conns.append((proto, c.laddr.ip, c.laddr.port, c.pid))
+        return conns
+
+    @staticmethod
+    def _interface_ips():
+        """This host's addresses, including ones no socket is bound to yet."""
+        ips = {"127.0.0.1", "::1"}
+        try:
+            for addrs in psutil.net_if_addrs().values():
+                for addr in addrs:
+                    if addr.family in (socket.AF_INET, socket.AF_INET6):
+                        ips.add(addr.address.split("%", 1)[0])  # Drop an IPv6 zone ("fe80::1%eth0")
+        except Exception:
+            pass
+        return ips
+
+    @staticmethod
+    def _apply_diff(live, snapshot):
+        removed = [key for key in live if key not in snapshot]
+        for key in removed:
+            live.pop(key, None)
+        added = 0
+        for key, value in snapshot.items():
+            if live.get(key) != value:
+                live[key] = value
+                added += 1
+        return added, len(removed)
@@ -1,9 +1,9 @@
 import psutil
+from core.process_registry import registry
 
 def kill_process_by_name(app_name):
-    """Terminates processes matching the given name."""
-    try:
-        for proc in psutil.process_iter(['name']):
-            if proc.info['name'] == app_name:
-                proc.terminate()
-    except: pass
\ No newline at end of file
+    """Terminates the processes behind an app name (a process name or a "name (pid)" label)."""
+    for info in registry.resolve(app_name):
+        try:
+            psutil.Process(info.pid).terminate()
+        except Exception: pass
@@ -0,0 +1,109 @@
+from array import array
+from collections import deque
+
+
+class RingSeries:
+    """
+    Fixed-capacity series of floats backed by an array('d'). Appends are O(1)
+    and the maximum over each configured trailing window is kept up to date
+    with a monotonic deque (amortized O(1)), so graphs never rescan history.
+    """
+
+    def __init__(self, capacity, windows=(60,)):
+        self.capacity = capacity
+        self.values = array('d', bytes(8 * capacity))
+        self.count = 0  # Total samples ever appended
+        self._max_queues = {w: deque() for w in windows}
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, value):
+        seq = self.count
+        self.values[seq % self.capacity] = value
+        self.count = seq + 1
+        for window, queue in self._max_queues.items():
+            while queue and queue[-1][1] <= value:
+                queue.pop()
+            queue.append((seq, value))
+            if queue[0][0] <= seq - window:
+                queue.popleft()
+
+    def max(self, window):
+        """Largest value among the last `window` samples (a configured window)."""
+        queue = self._max_queues[window]
+        return queue[0][1] if queue else 0.0
+
+    def last(self, n):
+        """The last n samples, oldest first."""
+        n = min(n, len(self))
+        if n <= 0:
+            return array('d')
+        end = self.count % self.capacity
+        start = end - n
+        if start >= 0:
+            return self.values[start:end]
+        return self.values[start:] + self.values[:end]
+
+
+def downsample_minmax(values, target):
+    """
+    Reduces `values` to at most `target` (index, value) points, keeping the
+    min and the max of each bucket in their original order so spikes survive.
+    """
+    n = len(values)
+    if n <= target:
+        return list(enumerate(values))
+    buckets = max(1, target // 2)
+    points = []
+    for b in range(buckets):
+        lo = b * n // buckets
+        hi = (b + 1) * n // buckets
+        chunk = values[lo:hi]
+        if not chunk:
+            continue
+        lo_v, hi_v = min(chunk), max(chunk)
+        i_min = lo + chunk.index(lo_v)
+        i_max = lo + chunk.index(hi_v)
+        if i_min == i_max:
+            points.append((i_min, lo_v))
+        elif i_min < i_max:
+            points.append((i_min, lo_v))
+            points.append((i_max, hi_v))
+        else:
+            points.append((i_max, hi_v))
+            points.append((i_min, lo_v))
+    return points
+
+
+def lttb(values, target):
+    """
+    Largest-Triangle-Three-Buckets downsampling to `target` (index, value)
+    points. Visually closer than min/max for smooth data, but O(n) in pure
+    Python, so it's meant for windows of a few thousand samples.
+    """
+    n = len(values)
+    if target >= n or target < 3:
+        return list(enumerate(values))
+    points = [(0, values[0])]
+    bucket_size = (n - 2) / (target - 2)
+    a = 0
+    for i in range(target - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_lo = int((i + 1) * bucket_size) + 1
+        next_hi = min(int((i + 2) * bucket_size) + 1, n)
+        avg_x = (next_lo + next_hi - 1) / 2
+        avg_y = sum(values[next_lo:next_hi]) / max(1, next_hi - next_lo)
+
+        lo = int(i * bucket_size) + 1
+        hi = int((i + 1) * bucket_size) + 1
+        ax, ay = a, values[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            area = abs((ax - avg_x) * (values[j] - ay) - (ax - j) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        points.append((best, values[best]))
+        a = best
+    points.append((n - 1, values[n - 1]))
+    return points
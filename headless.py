@@ -0,0 +1,88 @@
+"""
+Headless Packet Sentry daemon: capture, aggregation, pinging, database and
+cloud sync without Kivy or a display.
+
+Usage: sudo python headless.py [--status-every SECONDS] [--top N]
+"""
+import argparse
+import signal
+import threading
+
+from core.service import MonitorService
+
+
+def print_status(snapshot):
+    print(f"Total: down {snapshot['download_kb']:.1f} KB/s, up {snapshot['upload_kb']:.1f} KB/s")
+    rtt = snapshot.get("rtt", {})
+    destinations = snapshot.get("rtt_destinations", {})
+    talkers = snapshot.get("talkers", {})
+    for app_name, down, up in snapshot["top"]:
+        if down > 0 or up > 0:
+            p50 = rtt.get(app_name, {}).get("p50")
+            rtt_text = f" RTT p50 {p50:6.1f} ms" if p50 is not None else ""
+            print(f"  {app_name:<30} D:{down:9.2f} U:{up:9.2f} KB/s{rtt_text}")
+            for ip, host, stats in destinations.get(app_name, ()):
+                print(f"    -> {host or ip:<40} RTT p50 {stats['p50']:6.1f} / p95 {stats['p95']:6.1f} ms "
+                      f"({stats['count']} handshakes)")
+            if app_name in talkers:
+                # Sketched: true bytes are between the figure shown and figure + error
+                print("    top destinations: " + ", ".join(
+                    f"{host or ip} {(down + up) / 1024:.1f} KB (+{error / 1024:.1f})"
+                    for ip, host, down, up, error in talkers[app_name]))
+    for name, stats in snapshot.get("ping_stats", {}).items():
+        if stats["p50"] is None:
+            print(f"  Ping {name:<24} no replies ({stats['sent']} sent, {stats['method']})")
+        else:
+            print(f"  Ping {name:<24} p50 {stats['p50']:6.1f} / p95 {stats['p95']:6.1f} ms, "
+                  f"jitter {stats['jitter']:.1f} ms, loss {stats['loss']:.1f}% ({stats['method']})")
+    sketch = snapshot.get("sketch")
+    if sketch:
+        dst, tick = sketch["dst_ip"], sketch["tick"]
+        print(f"  Sketch: top {dst['k']} per app, {dst['tracked']} tracked, estimates within "
+              f"+{dst['error_bound_bytes'] / 1024:.1f} KB (eps {dst['epsilon']:.2g}, delta {dst['delta']:.2g}); "
+              f"last tick logged {tick.get('rows', 0)} of {tick.get('pairs', 0)} host pairs")
+    capture = snapshot.get("capture", {})
+    parts = []
+    ring = capture.get("ring")
+    if ring:
+        parts.append(f"ring {ring['depth']}/{ring['capacity']}, {ring['dropped']} dropped, "
+                     f"{ring['overruns']} overruns{'' if ring['alive'] else ', capture process down'}")
+    flows = capture.get("flows")
+    if flows:
+        parts.append(f"flows {flows['flows']}/{flows['max_flows']} ({flows['overflow_packets']} overflow packets)")
+    cache = capture.get("port_cache")
+    if cache:
+        parts.append(f"port cache hit rate {cache['hit_rate']:.0%}")
+    drain = capture.get("drain")
+    if drain and drain["drains"]:
+        parts.append(f"drain avg {drain['avg_ms']:.2f} ms, max {drain['max_ms']:.2f} ms")
+    if parts:
+        print("  Capture: " + "; ".join(parts))
+    resolver = snapshot.get("resolver")
+    if resolver:
+        print(f"  Reverse DNS: {resolver['size']} cached, hit rate {resolver['hit_rate']:.0%}, "
+              f"{resolver['pending']} pending")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packet Sentry headless daemon")
+    parser.add_argument("--status-every", type=float, default=0, help="print a summary every N seconds (0 = quiet)")
+    parser.add_argument("--top", type=int, default=10, help="apps shown in the summary")
+    args = parser.parse_args()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+
+    service = MonitorService(top_k=args.top)
+    service.start()
+    print("Packet Sentry running headless. Ctrl+C to stop.")
+    try:
+        while not stop_event.wait(args.status_every or None):
+            print_status(service.get_snapshot())
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,3 @@
-import psutil
 from kivy.config import Config
 Config.set('input', 'mouse', 'mouse,multitouch_on_demand')
 
@@ -7,9 +6,7 @@ from kivy.lang import Builder
 from kivy.clock import Clock
 from kivy.core.window import Window
 
-from core.packet_sniffer import PacketSniffer
-from core.aggregator import TrafficAggregator
-from core.pinger import NetworkPinger  
+from core.service import MonitorService
 from ui.widgets import TrafficGraph, AppDashboard, LogViewer, PingGraph, LoginPopup
 
 class NetworkApp(App):
@@ -18,63 +15,55 @@ class NetworkApp(App):
         return Builder.load_file("ui/dashboard.kv")
 
     def on_start(self):
-        # 1. Start Sniffer
-        self.sniffer = PacketSniffer()
-        self.sniffer.start()
-
-        # 2. Start Aggregator
-        self.aggregator = TrafficAggregator()
-        
-        # 3. Start Pinger 
-        self.pinger = NetworkPinger()
-        self.pinger.start()
-
-        # 4. Schedule Updates
-        Clock.schedule_interval(self.update_ui, 1.0)
-        Clock.schedule_interval(self.save_database, 5.0)
+        # Capture, aggregation, pinging and DB writes run on the service's own thread;
+        # the GUI is just a client of its snapshots
+        self.service = MonitorService()
+        self.service.start()
+        self.aggregator = self.service.aggregator
+        self.last_seq = 0
+
+        # The Latency tab plots the first two configured probe targets
+        self.ping_targets = list(self.service.pinger.targets)[:2]
+        self.update_ping_legends({})
 
-        # --- NEW: Initialize Hardware Counter ---
-        self.last_net_io = psutil.net_io_counters()
+        Clock.schedule_interval(self.update_ui, 1.0)
 
     def update_ui(self, dt):
-        # --- Update Traffic Tab ---
-        traffic_data = self.sniffer.get_traffic_data()
-        rates = self.aggregator.calculate_rates(traffic_data)
-        
-        # --- NEW: Hybrid Speed Fix (Accurate Hardware Stats) ---
-        current_net_io = psutil.net_io_counters()
-        
-        # Calculate bytes since last second
-        bytes_recv = current_net_io.bytes_recv - self.last_net_io.bytes_recv
-        bytes_sent = current_net_io.bytes_sent - self.last_net_io.bytes_sent
-        
-        # Convert to KB/s
-        download_kb = bytes_recv / 1024
-        upload_kb = bytes_sent / 1024
-        
-        # Save for next loop
-        self.last_net_io = current_net_io
-
-        # Update the Main Graph with ACCURATE numbers
+        snapshot = self.service.get_snapshot()
+        if snapshot["seq"] == self.last_seq:
+            return
+        self.last_seq = snapshot["seq"]
+
+        # Main graph uses the hardware interface counters (accurate totals)
         if "main_graph" in self.root.ids:
-            self.root.ids.main_graph.update_graph(download_kb, upload_kb)
-        # -------------------------------------------------------
+            self.root.ids.main_graph.update_graph(snapshot["download_kb"], snapshot["upload_kb"])
 
         if "dashboard" in self.root.ids:
             # Keep using Sniffer data for the App List (Details)
-            self.root.ids.dashboard.update_apps(rates)
+            self.root.ids.dashboard.update_apps(snapshot["rates"], snapshot["rtt"], snapshot["rtt_destinations"])
             
         # --- Update Latency Tab ---
         if "ping_graph" in self.root.ids:
-            pings = self.pinger.get_pings()
-            self.root.ids.ping_graph.update_graph(
-                pings.get("Cloudflare (1.1.1.1)", 0),
-                pings.get("Google (8.8.8.8)", 0)
-            )
-
-    def save_database(self, dt):
-        if hasattr(self, 'aggregator'):
-            self.aggregator.save_data()
+            pings = snapshot["pings"]
+            values = [pings.get(name, 0) for name in self.ping_targets] + [0, 0]
+            self.root.ids.ping_graph.update_graph(values[0], values[1])
+            self.update_ping_legends(snapshot["ping_stats"])
+
+    def update_ping_legends(self, ping_stats):
+        """Legend per plotted target: name and colour, then percentiles, jitter and loss once replies arrive."""
+        for i, legend in enumerate(("ping_legend_1", "ping_legend_2")):
+            if legend not in self.root.ids:
+                continue
+            if i >= len(self.ping_targets):
+                self.root.ids[legend].text = ""
+                continue
+            name = self.ping_targets[i]
+            text = f"{name} ({('Orange', 'Yellow')[i]})"
+            stats = ping_stats.get(name)
+            if stats and stats["p50"] is not None:
+                text += (f"  p50 {stats['p50']:.0f} / p95 {stats['p95']:.0f} ms, "
+                         f"jitter {stats['jitter']:.1f} ms, loss {stats['loss']:.0f}%")
+            self.root.ids[legend].text = text
 
     def open_db_view(self):
         """Opens the Log Viewer Popup"""
@@ -101,9 +90,7 @@ class NetworkApp(App):
             popup_instance.show_error("Invalid Credentials or Connection Failed")
 
     def on_stop(self):
-        if hasattr(self, 'sniffer'): self.sniffer.stop()
-        if hasattr(self, 'aggregator'): self.aggregator.save_data()
-        if hasattr(self, 'pinger'): self.pinger.stop() 
+        if hasattr(self, 'service'): self.service.stop()
 
 if __name__ == "__main__":
     NetworkApp().run()
\ No newline at end of file
@@ -0,0 +1,555 @@
+"""
+Packet Sentry collector: the /api/login and /api/sync endpoints the agents'
+CloudClient talks to, for many agents reporting to one box.
+
+- Syncs (gzip'd columnar or plain row JSON) are group-committed by one writer
+  thread into day-partitioned SQLite files; a sync is acknowledged only once
+  its rows are committed, and batches an agent already delivered are skipped.
+- Live per-agent status is kept in memory: GET /api/agents
+- Commands are queued per agent and handed out with the next sync response:
+  POST /api/agents/<agent_id>/commands {"action": "kill", "target": "chrome.exe"}
+- An agent id belongs to the user whose sync first used it: only that user
+  can sync as it, see it, or queue commands for it. Admins see and command
+  every agent.
+
+Usage:
+    python server/collector.py [--host 0.0.0.0] [--port 5000] [--data-dir collector_data] [--insecure]
+Users come from PACKETSENTRY_COLLECTOR_USERS ("alice:secret,bob:pw") and admins
+from PACKETSENTRY_COLLECTOR_ADMINS ("alice"). When no users are configured any
+non-empty username/password is accepted (development mode), which is only
+allowed on a loopback host unless --insecure is given.
+"""
+import argparse
+import gzip
+import ipaddress
+import json
+import math
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Same order as core.cloud_client.LOG_COLUMNS (kept here so the collector needs only the stdlib)
+LOG_COLUMNS = ["timestamp", "app_name", "download_speed", "upload_speed",
+               "src_ip", "dst_ip", "download_bytes", "upload_bytes"]
+# Commands queued for an agent that hasn't synced yet are kept up to this many
+MAX_COMMANDS = 100
+# Actions agents understand, with the string fields each needs
+COMMAND_FIELDS = {"kill": ("target",)}
+# Rows committed per writer transaction at most
+MAX_COMMIT_ROWS = 50000
+# How long a sync waits for its rows to commit before answering 503. Strictly
+# shorter than the agents' request timeout (core.cloud_client.REQUEST_TIMEOUT,
+# 10 s), so an agent never gives up on a sync the collector is still answering.
+SYNC_WRITE_TIMEOUT = 5.0
+
+
+class _Write:
+    """One sync's rows on their way through the writer queue."""
+    __slots__ = ("agent_id", "rows", "done", "ok", "state", "on_done")
+
+    def __init__(self, agent_id, rows, on_done=None):
+        self.agent_id = agent_id
+        self.rows = rows
+        self.done = threading.Event()
+        self.ok = False
+        self.state = "queued"  # -> "taken" by the writer, or "cancelled" by a timed-out request
+        self.on_done = on_done  # Called exactly once with the outcome, even after the request gave up
+
+    def finish(self, ok):
+        self.ok = ok
+        if self.on_done is not None:
+            try:
+                self.on_done(ok)
+            except Exception as e:
+                print(f"Collector write callback error: {e}")
+        self.done.set()
+
+
+class PartitionedStore:
+    """
+    One SQLite file per UTC day (logs_YYYYMMDD.db), so old data is dropped by
+    deleting files and each day's indexes stay small. All writes happen on one
+    writer thread that commits whatever syncs have queued up in a single
+    transaction per partition (group commit), then wakes the waiting requests.
+    """
+
+    def __init__(self, directory="collector_data", max_queue=10000):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.partitions = {}  # day -> connection (writer thread only)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.lock = threading.Lock()  # Guards _Write.state hand-offs
+        self.stats = {"commits": 0, "rows": 0, "commit_ms_last": 0.0, "commit_ms_max": 0.0}
+        self.running = True
+        self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer.start()
+
+    def write(self, agent_id, rows, timeout=SYNC_WRITE_TIMEOUT, on_done=None):
+        """
+        Queues rows and blocks until they are committed. Returns False when
+        the queue is full, on error, or after `timeout` seconds in all.
+        A timed-out write still queued is withdrawn, so it is never stored;
+        one the writer has already taken may still land. Either way
+        `on_done(ok)` reports the real outcome once it is known.
+        """
+        deadline = time.monotonic() + timeout
+        item = _Write(agent_id, rows, on_done)
+        try:
+            self.queue.put(item, timeout=timeout)
+        except queue.Full:
+            item.finish(False)
+            return False
+        if not item.done.wait(max(0.0, deadline - time.monotonic())):
+            with self.lock:
+                if item.state == "queued":
+                    item.state = "cancelled"
+                    item.finish(False)
+            return False
+        return item.ok
+
+    def close(self):
+        self.running = False
+        self.queue.put(None)
+        self.writer.join(timeout=10)
+
+    def _partition(self, day):
+        conn = self.partitions.get(day)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, f"logs_{day}.db"))
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS logs (
+                    agent_id TEXT,
+                    timestamp REAL,
+                    app_name TEXT,
+                    download_speed REAL,
+                    upload_speed REAL,
+                    src_ip TEXT,
+                    dst_ip TEXT,
+                    download_bytes INTEGER,
+                    upload_bytes INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_logs_agent ON logs (agent_id, timestamp)")
+            conn.commit()
+            self.partitions[day] = conn
+        return conn
+
+    def _take(self, item):
+        if item is None:
+            return False
+        with self.lock:
+            if item.state != "queued":
+                return False
+            item.state = "taken"
+        return True
+
+    def _writer_loop(self):
+        while self.running or not self.queue.empty():
+            item = self.queue.get()
+            if not self._take(item):
+                continue
+            batch = [item]
+            rows_total = len(item.rows)
+            # Take everything else already waiting: one commit covers many syncs
+            while rows_total < MAX_COMMIT_ROWS:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if not self._take(item):
+                    continue
+                batch.append(item)
+                rows_total += len(item.rows)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # The writer must outlive any one bad batch, and every waiter must hear back
+                print(f"Collector writer error: {e}")
+                for item in batch:
+                    if not item.done.is_set():
+                        item.finish(False)
+
+    def _commit(self, batch):
+        start = time.perf_counter()
+        by_day = {}  # Days since the epoch (UTC) -> rows
+        accepted = []
+        for item in batch:
+            # Grouped per item first: a malformed row fails its own sync, not the whole commit
+            try:
+                grouped = {}
+                for row in item.rows:
+                    grouped.setdefault(int(row[0] // 86400), []).append((item.agent_id,) + tuple(row))
+            except Exception as e:
+                print(f"Collector rejected rows from {item.agent_id}: {e}")
+                item.finish(False)
+                continue
+            for day, day_rows in grouped.items():
+                by_day.setdefault(day, []).extend(day_rows)
+            accepted.append(item)
+        ok = True
+        try:
+            for day, day_rows in by_day.items():
+                conn = self._partition(time.strftime("%Y%m%d", time.gmtime(day * 86400)))
+                with conn:
+                    conn.executemany("INSERT INTO logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", day_rows)
+        except Exception as e:
+            print(f"Collector write error: {e}")
+            ok = False
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["commits"] += 1
+        self.stats["rows"] += sum(len(rows) for rows in by_day.values()) if ok else 0
+        self.stats["commit_ms_last"] = elapsed_ms
+        self.stats["commit_ms_max"] = max(self.stats["commit_ms_max"], elapsed_ms)
+        for item in accepted:
+            item.finish(ok)
+
+
+# Per LOG_COLUMNS entry: the type its values are coerced to, and whether None is allowed
+_COLUMN_TYPES = [(float, False), (str, True), (float, True), (float, True), (str, True), (str, True),
+                 (int, True), (int, True)]
+_NUMBER_TYPES = {int, float}
+
+
+def _check_column(values, kind, nullable, name):
+    """`values` coerced to `kind` (a whole column at a time, so the checks run at C speed)."""
+    types = set(map(type, values))
+    if nullable:
+        types.discard(type(None))
+    elif type(None) in types:
+        raise ValueError(f"{name} is missing")
+    if kind is str:
+        if types - {str}:
+            raise ValueError(f"{name} must be a string")
+        return values
+    if types - _NUMBER_TYPES:
+        raise ValueError(f"{name} must be a number")
+    if types == {kind} and kind is int:
+        return values
+    numbers = [value for value in values if value is not None] if nullable else values
+    if float in types and not all(map(math.isfinite, numbers)):
+        raise ValueError(f"{name} must be finite")
+    if types == {kind}:
+        return values
+    return [None if value is None else kind(value) for value in values]
+
+
+def decode_logs(payload):
+    """
+    Rows from a sync body, normalized to LOG_COLUMNS order: the columnar
+    format, or {"logs": [...]} with 8-field or legacy 6-field (no bytes) tuples.
+    Every value is type-checked; raises ValueError on a malformed payload.
+    """
+    if payload.get("format") == "columnar":
+        columns = payload.get("columns") or LOG_COLUMNS
+        data = payload.get("data") or []
+        if not isinstance(columns, list) or not isinstance(data, list) or len(columns) != len(data):
+            raise ValueError("columns and data don't match")
+        if any(not isinstance(column, list) for column in data):
+            raise ValueError("data must be a list of columns")
+        index = {name: i for i, name in enumerate(columns) if isinstance(name, str)}
+        length = len(data[0]) if data else 0
+        if any(len(column) != length for column in data):
+            raise ValueError("columns of different lengths")
+        picked = [data[index[name]] if name in index else [None] * length for name in LOG_COLUMNS]
+    else:
+        logs = payload.get("logs") or []
+        if not isinstance(logs, list):
+            raise ValueError("logs must be a list")
+        rows = []
+        for log in logs:
+            if not isinstance(log, (list, tuple)) or len(log) < 6:
+                raise ValueError(f"malformed log row {log!r}")
+            log = tuple(log)
+            rows.append(log + (None,) * (len(LOG_COLUMNS) - len(log)) if len(log) < len(LOG_COLUMNS)
+                        else log[:len(LOG_COLUMNS)])
+        length = len(rows)
+        picked = [list(column) for column in zip(*rows)] if rows else [[] for _ in LOG_COLUMNS]
+    if not length:
+        return []
+    checked = [_check_column(values, kind, nullable, name)
+               for values, name, (kind, nullable) in zip(picked, LOG_COLUMNS, _COLUMN_TYPES)]
+    return list(zip(*checked))
+
+
+def _row_id(value, name):
+    if value is None or (isinstance(value, int) and not isinstance(value, bool)):
+        return value
+    raise ValueError(f"{name} must be an integer")
+
+
+class Collector:
+    """Auth, per-agent state and command queues shared by all request threads."""
+
+    def __init__(self, store, users=None, admins=None):
+        self.store = store
+        self.users = users or {}
+        self.admins = set(admins or ())
+        self.tokens = {}  # token -> username
+        self.agents = {}  # agent_id -> live state
+        self.commands = {}  # agent_id -> deque of commands
+        self.lock = threading.Lock()
+        self.stats = {"syncs": 0, "duplicates": 0, "busy": 0, "rows": 0}
+
+    def login(self, username, password):
+        if not username or not password:
+            return None
+        if self.users and self.users.get(username) != password:
+            return None
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.tokens[token] = username
+        return token
+
+    def user_for(self, token):
+        with self.lock:
+            return self.tokens.get(token)
+
+    def can_manage(self, username, agent_id):
+        """Whether `username` may queue commands for (and see) an agent. Call with the lock held."""
+        if username in self.admins:
+            return True
+        agent = self.agents.get(agent_id)
+        return agent is not None and agent["user"] == username
+
+    def sync(self, username, token, payload):
+        """
+        Stores the batch (unless already stored) and returns the commands for
+        this agent, or None if storage is unavailable. Raises PermissionError
+        if the agent id belongs to another user, ValueError on a malformed body.
+
+        Agents number their rows (outbox ids) and send the batch's id range
+        (first_id..last_id, plus per-row ids). Everything up to the agent's
+        highest committed id is already stored, so a resent batch (even a
+        shorter or overlapping one) only stores the rows beyond it. While one
+        of the agent's batches is still being written, another batch with rows
+        gets a 503 instead of racing it.
+        """
+        agent_id = str(payload.get("agent_id") or token)
+        first_id = _row_id(payload.get("first_id"), "first_id")
+        last_id = _row_id(payload.get("last_id", payload.get("batch_id")), "last_id")
+        rows = decode_logs(payload)
+        ids = payload.get("ids")
+        if ids is not None and (not isinstance(ids, list) or len(ids) != len(rows)
+                                or any(_row_id(row_id, "ids") is None for row_id in ids)):
+            raise ValueError("ids must be one integer per row")
+
+        with self.lock:
+            agent = self.agents.get(agent_id)
+            if agent is not None and agent["user"] != username:
+                raise PermissionError(agent_id)
+            if agent is None:
+                agent = self.agents[agent_id] = {"user": username, "last_batch": None, "rows": 0, "inflight": None}
+            agent.update(last_seen=time.time(), status=payload.get("status") or [])
+            acked = agent["last_batch"]
+            duplicate = last_id is not None and acked is not None and last_id <= acked
+            if not duplicate and acked is not None and ids is not None:
+                # Overlaps a batch already stored: keep only the rows beyond it
+                rows = [row for row, row_id in zip(rows, ids) if row_id > acked]
+            if rows and not duplicate:
+                if agent["inflight"] is not None:
+                    self.stats["busy"] += 1
+                    return None
+                agent["inflight"] = (first_id, last_id)
+            if duplicate:
+                # The agent missed our last ack and resent: it's already stored
+                self.stats["duplicates"] += 1
+
+        if rows and not duplicate:
+            def finished(ok):
+                # Runs when the commit really lands (or fails), even if this request timed out first
+                with self.lock:
+                    agent["inflight"] = None
+                    if ok:
+                        if last_id is not None:
+                            agent["last_batch"] = max(last_id, agent["last_batch"] or last_id)
+                        agent["rows"] += len(rows)
+                        self.stats["rows"] += len(rows)
+
+            if not self.store.write(agent_id, rows, on_done=finished):
+                return None
+        elif not duplicate and last_id is not None:
+            with self.lock:
+                # Nothing left to store (every row was already here)
+                agent["last_batch"] = max(last_id, agent["last_batch"] or last_id)
+
+        with self.lock:
+            self.stats["syncs"] += 1
+            pending = self.commands.get(agent_id)
+            commands = list(pending) if pending else []
+            if pending:
+                pending.clear()
+        return commands
+
+    def queue_command(self, username, agent_id, command):
+        """
+        Raises PermissionError unless `username` owns the agent or is an admin
+        (only admins can queue for an agent that hasn't synced yet), and
+        ValueError for a command agents wouldn't understand.
+        """
+        fields = COMMAND_FIELDS.get(command.get("action")) if isinstance(command, dict) else None
+        if fields is None:
+            raise ValueError(f"unknown command; actions: {', '.join(COMMAND_FIELDS)}")
+        for field in fields:
+            if not isinstance(command.get(field), str) or not command[field]:
+                raise ValueError(f"{command['action']} needs a {field!r} string")
+        command = {"action": command["action"], **{field: command[field] for field in fields}}
+        with self.lock:
+            if not self.can_manage(username, agent_id):
+                raise PermissionError(agent_id)
+            self.commands.setdefault(agent_id, deque(maxlen=MAX_COMMANDS)).append(command)
+
+    def snapshot(self, username):
+        """Live state of the agents `username` can manage, plus collector-wide stats."""
+        with self.lock:
+            agents = {agent_id: dict(state) for agent_id, state in self.agents.items()
+                      if self.can_manage(username, agent_id)}
+            stats = dict(self.stats)
+        stats.update(self.store.stats)
+        return {"agents": agents, "stats": stats}
+
+
+class CollectorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so pooled agent connections stay open
+    collector = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, body):
+        data = json.dumps(body, separators=(",", ":")).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        return json.loads(body or b"{}")
+
+    def _token(self):
+        auth = self.headers.get("Authorization", "")
+        return auth[7:] if auth.startswith("Bearer ") else None
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except (ValueError, OSError):
+            return self._send(400, {"error": "bad request body"})
+
+        path = self.path.split("?", 1)[0]
+        if path == "/api/login":
+            token = self.collector.login(payload.get("username"), payload.get("password"))
+            if token is None:
+                return self._send(401, {"error": "invalid credentials"})
+            return self._send(200, {"access_token": token})
+
+        token = self._token()
+        username = self.collector.user_for(token) if token else None
+        if username is None:
+            return self._send(401, {"error": "unauthorized"})
+
+        if path == "/api/sync":
+            try:
+                commands = self.collector.sync(username, token, payload)
+            except PermissionError:
+                return self._send(403, {"error": "agent id belongs to another user"})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            if commands is None:
+                return self._send(503, {"error": "storage unavailable"})
+            return self._send(200, {"commands": commands})
+
+        parts = path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["api", "agents"] and parts[3] == "commands":
+            try:
+                self.collector.queue_command(username, parts[2], payload)
+            except PermissionError:
+                return self._send(403, {"error": "not your agent"})
+            except ValueError as e:
+                return self._send(400, {"error": str(e)})
+            return self._send(200, {"queued": True})
+        self._send(404, {"error": "not found"})
+
+    def do_GET(self):
+        username = self.collector.user_for(self._token() or "")
+        if username is None:
+            return self._send(401, {"error": "unauthorized"})
+        if self.path.split("?", 1)[0] == "/api/agents":
+            return self._send(200, self.collector.snapshot(username))
+        self._send(404, {"error": "not found"})
+
+
+def parse_users(spec):
+    users = {}
+    for item in (spec or "").split(","):
+        if ":" in item:
+            name, password = item.split(":", 1)
+            users[name.strip()] = password
+    return users
+
+
+def parse_admins(spec):
+    return {name.strip() for name in (spec or "").split(",") if name.strip()}
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def make_server(host="127.0.0.1", port=5000, data_dir="collector_data", users=None, admins=None,
+                insecure=False):
+    """Refuses (ValueError) to accept any login on a reachable host unless `insecure` is set."""
+    if not users and not insecure and not is_loopback(host):
+        raise ValueError(f"no collector users configured: refusing to accept any login on {host} "
+                         "(set PACKETSENTRY_COLLECTOR_USERS, or pass --insecure)")
+    store = PartitionedStore(data_dir)
+    collector = Collector(store, users, admins)
+    handler = type("BoundCollectorHandler", (CollectorHandler,), {"collector": collector})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Packet Sentry sync collector")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--data-dir", default="collector_data")
+    parser.add_argument("--insecure", action="store_true",
+                        help="accept any login even on a non-loopback host (development only)")
+    args = parser.parse_args()
+
+    users = parse_users(os.environ.get("PACKETSENTRY_COLLECTOR_USERS"))
+    admins = parse_admins(os.environ.get("PACKETSENTRY_COLLECTOR_ADMINS"))
+    try:
+        server = make_server(args.host, args.port, args.data_dir, users, admins, args.insecure)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Collector listening on http://{args.host}:{args.port}/api "
+          f"({'configured users' if users else 'development mode: any login accepted'})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.collector.store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Load generator for the sync collector: N simulated agents, each with its own
+keep-alive session, post gzip'd columnar batches (the same encoding as
+CloudClient) in a loop. Reports ingest rows/sec and sync latency percentiles.
+
+Usage:
+    python server/loadgen.py --agents 200 --rows 500 --duration 30 [--url http://127.0.0.1:5000/api]
+    python server/loadgen.py --agents 200 --spawn     # starts a collector in-process on a temp dir
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.cloud_client import encode_payload
+
+
+def make_rows(rnd, count, apps=30):
+    now = time.time()
+    return [
+        (now, f"app-{rnd.randrange(apps):02d}", rnd.random() * 500, rnd.random() * 50,
+         "192.168.1.10", f"10.{rnd.randrange(4)}.{rnd.randrange(256)}.{rnd.randrange(1, 255)}",
+         rnd.randrange(1 << 20), rnd.randrange(1 << 16))
+        for _ in range(count)
+    ]
+
+
+def run_agent(index, args, ready, go, latencies, counters, lock):
+    rnd = random.Random(index)
+    session = requests.Session()
+    r = session.post(f"{args.url}/login", json={"username": f"agent{index}", "password": "load"}, timeout=10)
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}", "Content-Type": "application/json",
+               "Content-Encoding": "gzip"}
+    agent_id = f"loadgen-{index}"
+    # Pre-encode a few payloads so the generator's own CPU doesn't cap the measurement
+    payloads = [encode_payload(make_rows(rnd, args.rows), [], agent_id, None)[1] for _ in range(4)]
+    ready.release()
+    go.wait()
+    deadline = go.deadline
+    sent = 0
+    mine = []
+    while time.monotonic() < deadline:
+        # No row ids in these payloads, so the collector stores every post
+        body = payloads[sent % len(payloads)]
+        sent += 1
+        start = time.perf_counter()
+        try:
+            r = session.post(f"{args.url}/sync", data=body, headers=headers, timeout=30)
+            ok = r.status_code == 200
+        except requests.RequestException:
+            ok = False
+        mine.append((time.perf_counter() - start) * 1000)
+        with lock:
+            counters["ok" if ok else "failed"] += 1
+            counters["rows"] += args.rows if ok else 0
+        if args.interval:
+            time.sleep(args.interval)
+    with lock:
+        latencies.extend(mine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated agents against the sync collector")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/api")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=500, help="log rows per sync")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--interval", type=float, default=0, help="pause between syncs per agent (0 = flat out)")
+    parser.add_argument("--spawn", action="store_true", help="run a collector in-process on a temp directory")
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        from server.collector import make_server
+        server = make_server("127.0.0.1", 0, tempfile.mkdtemp(prefix="collector-"))
+        args.url = f"http://127.0.0.1:{server.server_address[1]}/api"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies = []
+    counters = {"ok": 0, "failed": 0, "rows": 0}
+    lock = threading.Lock()
+    ready = threading.Semaphore(0)
+    go = threading.Event()
+    threads = [threading.Thread(target=run_agent, args=(i, args, ready, go, latencies, counters, lock), daemon=True)
+               for i in range(args.agents)]
+    for t in threads:
+        t.start()
+    # Logins and payload encoding happen before the clock starts
+    for _ in threads:
+        ready.acquire()
+    start = time.monotonic()
+    go.deadline = start + args.duration
+    go.set()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - start
+
+    latencies.sort()
+    pick = lambda q: latencies[min(len(latencies) - 1, int(q / 100 * len(latencies)))] if latencies else 0.0
+    print(f"{args.agents} agents x {args.rows} rows/sync for {elapsed:.1f}s")
+    print(f"syncs ok={counters['ok']} failed={counters['failed']}  ingest {counters['rows'] / elapsed:,.0f} rows/s")
+    print(f"sync latency p50={pick(50):.1f}ms p95={pick(95):.1f}ms p99={pick(99):.1f}ms max={pick(100):.1f}ms")
+    if server is not None:
+        server.shutdown()
+        stats = server.RequestHandlerClass.collector.snapshot(None)["stats"]
+        server.RequestHandlerClass.collector.store.close()
+        print(f"collector: {stats['rows']:,} rows stored in {stats['commits']:,} commits "
+              f"(max commit {stats['commit_ms_max']:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
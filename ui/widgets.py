@@ -3,13 +3,20 @@ from kivy.uix.label import Label
 from kivy.uix.dropdown import DropDown
 from kivy.uix.button import Button
 from kivy.uix.modalview import ModalView
-from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.textinput import TextInput
+from kivy.uix.spinner import Spinner
+from kivy.uix.togglebutton import ToggleButton
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.graphics import Color, Rectangle
 from kivy.core.window import Window
 from kivy_garden.graph import Graph, LinePlot 
-import psutil
+from core.timeseries import RingSeries, downsample_minmax
+from core.process_registry import registry
+from core.system_control import kill_process_by_name
 import math
 import subprocess
 import os
@@ -17,15 +24,17 @@ import platform
 import datetime
 import csv
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # --- COLOR CONSTANTS ---
 COLOR_DOWN = [0, 1, 0, 1]       # Green
 COLOR_UP   = [0.2, 0.8, 1, 1]   # Bright Sky Blue
 COLOR_TEXT = [1, 1, 1, 1]       # White
+COLOR_RTT  = [1, 0.6, 0.8, 1]   # Pink (handshake RTT)
 
 # New Colors for Ping
-COLOR_PING_CF = [1, 0.5, 0, 1]  # Orange (Cloudflare)
-COLOR_PING_G  = [1, 1, 0, 1]    # Yellow (Google)
+COLOR_PING_CF = [1, 0.5, 0, 1]  # Orange (first configured target; Cloudflare by default)
+COLOR_PING_G  = [1, 1, 0, 1]    # Yellow (second target; Google by default)
 
 # =========================
 #   CUSTOM HOVER BUTTON
@@ -106,93 +115,104 @@ class LoginPopup(ModalView):
 # =========================
 #   1. TRAFFIC GRAPH
 # =========================
-class TrafficGraph(BoxLayout):
-    def __init__(self, **kwargs):
+# Selectable graph windows: (label, seconds, x unit in seconds, unit name, major tick)
+GRAPH_WINDOWS = [
+    ("1m", 60, 1, "Seconds", 10),
+    ("15m", 900, 60, "Minutes", 3),
+    ("1h", 3600, 60, "Minutes", 10),
+    ("24h", 86400, 3600, "Hours", 4),
+]
+# Rendered points per line, whatever the window length
+GRAPH_POINTS = 300
+
+
+class SeriesGraph(BoxLayout):
+    """
+    Line graph over one-sample-per-tick ring buffers. Long windows are
+    downsampled to GRAPH_POINTS so drawing cost doesn't grow with the window.
+    """
+
+    def __init__(self, ylabel, colors, y_step, y_ticks, y_floor=100, downsample=downsample_minmax, **kwargs):
         super().__init__(**kwargs)
         self.orientation = 'vertical'
+        self.y_step = y_step
+        self.y_ticks = y_ticks
+        self.y_floor = y_floor
+        self.downsample = downsample
+        self.window = GRAPH_WINDOWS[0]
+        self.drawn_at = -1
+
+        window_seconds = tuple(w[1] for w in GRAPH_WINDOWS)
+        self.series = [RingSeries(window_seconds[-1], windows=window_seconds) for _ in colors]
+
+        selector = BoxLayout(size_hint_y=None, height=dp(24), spacing=4)
+        selector.add_widget(Label())
+        for window in GRAPH_WINDOWS:
+            btn = ToggleButton(text=window[0], group=f"window-{id(self)}", size_hint_x=None, width=dp(44),
+                               state='down' if window is self.window else 'normal', allow_no_selection=False)
+            btn.bind(on_release=lambda b, w=window: self.set_window(w))
+            selector.add_widget(btn)
+        self.add_widget(selector)
+
         self.graph = Graph(
-            xlabel='Time (Seconds)', ylabel='Speed (KB/s)',
-            x_ticks_minor=0, x_ticks_major=10, y_ticks_major=100,
+            xlabel='Time (Seconds)', ylabel=ylabel,
+            x_ticks_minor=0, x_ticks_major=10, y_ticks_major=y_floor // y_ticks,
             y_grid_label=True, x_grid_label=True, padding=5,
-            x_grid=True, y_grid=True, xmin=0, xmax=60, ymin=0, ymax=100,
+            x_grid=True, y_grid=True, xmin=-60, xmax=0, ymin=0, ymax=y_floor,
             label_options={'color': [1, 1, 1, 1], 'bold': True}
         )
-        self.plot_down = LinePlot(color=COLOR_DOWN, line_width=2)
-        self.plot_up = LinePlot(color=COLOR_UP, line_width=2)
-        self.graph.add_plot(self.plot_down)
-        self.graph.add_plot(self.plot_up)
+        self.plots = [LinePlot(color=color, line_width=2) for color in colors]
+        for plot in self.plots:
+            self.graph.add_plot(plot)
         self.add_widget(self.graph)
-        self.points_down = []
-        self.points_up = []
 
-    def update_graph(self, down_val, up_val):
-        current_x = len(self.points_down)
-        self.points_down.append((current_x, down_val))
-        self.points_up.append((current_x, up_val))
-
-        if len(self.points_down) > 60:
-            self.points_down.pop(0)
-            self.points_up.pop(0)
-            self.points_down = [(x - 1, y) for x, y in self.points_down]
-            self.points_up = [(x - 1, y) for x, y in self.points_up]
-
-        max_v = max(
-            max([y for x, y in self.points_down] or [0]), 
-            max([y for x, y in self.points_up] or [0])
-        )
-        target_ymax = max(100, math.ceil(max_v / 100) * 100)
+    def set_window(self, window):
+        label, seconds, unit, unit_name, major = window
+        self.window = window
+        self.graph.xmin = -seconds / unit
+        self.graph.xlabel = f'Time ({unit_name} ago)'
+        self.graph.x_ticks_major = major
+        self.drawn_at = -1
+        self._redraw()
+
+    def add_values(self, *values):
+        for series, value in zip(self.series, values):
+            series.append(value)
+        # Long windows only change visibly once a whole downsampling bucket has filled
+        stride = max(1, self.window[1] * 2 // GRAPH_POINTS)
+        if self.drawn_at < 0 or self.series[0].count - self.drawn_at >= stride:
+            self._redraw()
+
+    def _redraw(self):
+        _label, seconds, unit, _unit_name, _major = self.window
+        max_v = max(series.max(seconds) for series in self.series)
+        target_ymax = max(self.y_floor, math.ceil(max_v / self.y_step) * self.y_step)
         self.graph.ymax = int(target_ymax)
-        self.graph.y_ticks_major = int(target_ymax / 4)
-        self.plot_down.points = self.points_down
-        self.plot_up.points = self.points_up
+        self.graph.y_ticks_major = int(target_ymax / self.y_ticks)
+
+        for series, plot in zip(self.series, self.plots):
+            values = series.last(seconds)
+            newest = len(values) - 1
+            plot.points = [((i - newest) / unit, v) for i, v in self.downsample(values, GRAPH_POINTS)]
+        self.drawn_at = self.series[0].count
+
+
+class TrafficGraph(SeriesGraph):
+    def __init__(self, **kwargs):
+        super().__init__('Speed (KB/s)', [COLOR_DOWN, COLOR_UP], y_step=100, y_ticks=4, **kwargs)
+
+    def update_graph(self, down_val, up_val):
+        self.add_values(down_val, up_val)
 
 # =========================
 #   2. PING GRAPH
 # =========================
-class PingGraph(BoxLayout):
+class PingGraph(SeriesGraph):
     def __init__(self, **kwargs):
-        super().__init__(**kwargs)
-        self.orientation = 'vertical'
-        self.graph = Graph(
-            xlabel='Time (Seconds)', ylabel='Latency (ms)',
-            x_ticks_minor=0, x_ticks_major=10, y_ticks_major=20,
-            y_grid_label=True, x_grid_label=True, padding=5,
-            x_grid=True, y_grid=True, xmin=0, xmax=60, ymin=0, ymax=200, 
-            label_options={'color': [1, 1, 1, 1], 'bold': True}
-        )
-        
-        self.plot_cf = LinePlot(color=COLOR_PING_CF, line_width=2)
-        self.plot_g  = LinePlot(color=COLOR_PING_G, line_width=2)
-
-        self.graph.add_plot(self.plot_cf)
-        self.graph.add_plot(self.plot_g)
-        
-        self.add_widget(self.graph)
-        self.points_cf = []
-        self.points_g = []
-
-    def update_graph(self, ping_cf, ping_g):
-        current_x = len(self.points_cf)
-        
-        self.points_cf.append((current_x, ping_cf))
-        self.points_g.append((current_x, ping_g))
-
-        if len(self.points_cf) > 60:
-            self.points_cf.pop(0)
-            self.points_g.pop(0)
-            self.points_cf = [(x - 1, y) for x, y in self.points_cf]
-            self.points_g = [(x - 1, y) for x, y in self.points_g]
-
-        max_v = max(
-            max([y for x, y in self.points_cf] or [0]), 
-            max([y for x, y in self.points_g] or [0])
-        )
-        target_ymax = max(100, math.ceil(max_v / 50) * 50)
-        self.graph.ymax = int(target_ymax)
-        self.graph.y_ticks_major = int(target_ymax / 5)
+        super().__init__('Latency (ms)', [COLOR_PING_CF, COLOR_PING_G], y_step=50, y_ticks=5, **kwargs)
 
-        self.plot_cf.points = self.points_cf
-        self.plot_g.points = self.points_g
+    def update_graph(self, ping_first, ping_second):
+        self.add_values(ping_first, ping_second)
 
 # =========================
 #   3. GRAPH POPUP
@@ -211,10 +231,21 @@ class AppGraphPopup(ModalView):
         layout.add_widget(header)
         self.graph_widget = TrafficGraph()
         layout.add_widget(self.graph_widget)
+        # Handshake RTT to the app's busiest destinations, next to its bandwidth
+        self.lbl_destinations = Label(text="", size_hint_y=None, height=dp(70), color=COLOR_RTT,
+                                      halign="left", valign="top")
+        self.lbl_destinations.bind(size=self.lbl_destinations.setter('text_size'))
+        layout.add_widget(self.lbl_destinations)
         self.add_widget(layout)
 
-    def update(self, down, up):
+    def update(self, down, up, destinations=None):
         self.graph_widget.update_graph(down, up)
+        if destinations:
+            text = "\n".join(f"RTT to {host or ip}: {_format_rtt(stats)} ({stats['count']} handshakes)"
+                             for ip, host, stats in destinations)
+        else:
+            text = "No handshake RTT samples yet"
+        if self.lbl_destinations.text != text: self.lbl_destinations.text = text
 
 # =========================
 #   4. TABLE COMPONENTS
@@ -224,10 +255,12 @@ class TableHeader(BoxLayout):
         self.btn_name.text = "APPLICATION (Sort A-Z)"
         self.btn_down.text = "DOWNLOAD"
         self.btn_up.text = "UPLOAD"
+        self.btn_rtt.text = "RTT p50/p95"
         arrow = " v" if sort_desc else " ^"
         if sort_key == 'name': self.btn_name.text += arrow
         elif sort_key == 'download': self.btn_down.text += arrow
         elif sort_key == 'upload': self.btn_up.text += arrow
+        elif sort_key == 'rtt': self.btn_rtt.text += arrow
 
     def __init__(self, sort_callback, **kwargs):
         super().__init__(**kwargs)
@@ -240,77 +273,69 @@ class TableHeader(BoxLayout):
             btn.bind(on_release=lambda x: sort_callback(key))
             return btn
 
-        self.btn_name = create_header_btn("APPLICATION (Sort A-Z)", 'name', [1,1,0,1], 0.5)
-        self.btn_down = create_header_btn("DOWNLOAD", 'download', COLOR_DOWN, 0.25)
-        self.btn_up = create_header_btn("UPLOAD", 'upload', COLOR_UP, 0.25)
+        self.btn_name = create_header_btn("APPLICATION (Sort A-Z)", 'name', [1,1,0,1], 0.4)
+        self.btn_down = create_header_btn("DOWNLOAD", 'download', COLOR_DOWN, 0.2)
+        self.btn_up = create_header_btn("UPLOAD", 'upload', COLOR_UP, 0.2)
+        self.btn_rtt = create_header_btn("RTT p50/p95", 'rtt', COLOR_RTT, 0.2)
 
         self.add_widget(self.btn_name)
         self.add_widget(self.btn_down)
         self.add_widget(self.btn_up)
+        self.add_widget(self.btn_rtt)
 
-class AppRow(BoxLayout):
-    def __init__(self, app_name, **kwargs):
+class AppRow(RecycleDataViewBehavior, BoxLayout):
+    """A visible table row. Instances are recycled by the RecycleView as the list scrolls."""
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.app_name = app_name
+        self.app_name = ""
+        self.index = 0
+        self.dashboard = None
         self.size_hint_y = None
         self.height = dp(40)
         self.padding = (dp(10), 0)
-        self.popup = None
         with self.canvas.before:
             Color(0.3, 0.3, 0.3, 1) 
             self.rect = Rectangle(size=(self.width, 1), pos=(self.x, self.y))
         self.bind(pos=self.update_rect, size=self.update_rect)
 
-        self.lbl_name = Label(text=app_name, size_hint_x=0.5, halign='left', valign='middle', shorten=True, color=COLOR_TEXT)
+        self.lbl_name = Label(text="", size_hint_x=0.4, halign='left', valign='middle', shorten=True, color=COLOR_TEXT)
         self.lbl_name.bind(size=self.lbl_name.setter('text_size'))
         self.add_widget(self.lbl_name)
 
-        self.lbl_down = Label(text="0.00", size_hint_x=0.25, color=COLOR_DOWN)
+        self.lbl_down = Label(text="0.00", size_hint_x=0.2, color=COLOR_DOWN)
         self.add_widget(self.lbl_down)
-        self.lbl_up = Label(text="0.00", size_hint_x=0.25, color=COLOR_UP)
+        self.lbl_up = Label(text="0.00", size_hint_x=0.2, color=COLOR_UP)
         self.add_widget(self.lbl_up)
-        self.dropdown = self._create_dropdown()
+        self.lbl_rtt = Label(text="-", size_hint_x=0.2, color=COLOR_RTT)
+        self.add_widget(self.lbl_rtt)
 
     def update_rect(self, *args):
         self.rect.pos = self.pos
         self.rect.size = (self.width, 1)
 
-    def update_data(self, down, up):
-        self.lbl_down.text = f"{down:.2f} KB/s"
-        self.lbl_up.text = f"{up:.2f} KB/s"
-        if self.popup and self.popup.parent:
-            self.popup.update(down, up)
-
-    def _create_dropdown(self):
-        dropdown = DropDown(auto_width=False, width=dp(160))
-        def add_item(text, cb):
-            btn = Button(text=text, size_hint_y=None, height=dp(30), font_size="13sp")
-            btn.bind(on_release=lambda *_: (cb(), dropdown.dismiss()))
-            dropdown.add_widget(btn)
-        add_item("Show Graph", self.open_graph)
-        add_item("Close App", self.close_app)
-        return dropdown
+    def refresh_view_attrs(self, rv, index, data):
+        # Only touch labels whose text actually changed (each change re-renders a texture)
+        self.index = index
+        self.dashboard = rv.dashboard
+        self.app_name = data["app_name"]
+        if self.lbl_name.text != data["app_name"]: self.lbl_name.text = data["app_name"]
+        if self.lbl_down.text != data["down_text"]: self.lbl_down.text = data["down_text"]
+        if self.lbl_up.text != data["up_text"]: self.lbl_up.text = data["up_text"]
+        if self.lbl_rtt.text != data["rtt_text"]: self.lbl_rtt.text = data["rtt_text"]
 
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos) and touch.button == "right":
-            self.dropdown.open(self)
+            if self.dashboard: self.dashboard.open_menu(self)
             return True
         return super().on_touch_down(touch)
 
-    def open_graph(self):
-        if not self.popup: self.popup = AppGraphPopup(self.app_name)
-        self.popup.open()
-
-    def close_app(self):
-        for proc in psutil.process_iter(["name"]):
-            try:
-                if proc.info["name"] == self.app_name:
-                    proc.terminate()
-            except Exception: pass
-
 # =========================
 #   5. DASHBOARD
 # =========================
+def _format_rtt(stats):
+    if not stats or stats["p50"] is None: return "-"
+    return f"{stats['p50']:.0f} / {stats['p95']:.0f} ms"
+
 class AppDashboard(BoxLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -319,91 +344,170 @@ class AppDashboard(BoxLayout):
         self.sort_desc = True
         self.header = TableHeader(self.change_sort)
         self.add_widget(self.header)
-        self.scroll_view = ScrollView(size_hint=(1, 1), do_scroll_x=False)
-        self.rows_container = BoxLayout(orientation='vertical', size_hint_y=None)
-        self.rows_container.bind(minimum_height=self.rows_container.setter('height'))
-        self.scroll_view.add_widget(self.rows_container)
-        self.add_widget(self.scroll_view)
-        self.rows = {}
+
+        # Virtualized list: only rows on screen exist as widgets
+        self.rv = RecycleView(size_hint=(1, 1), do_scroll_x=False)
+        self.rv.viewclass = AppRow
+        self.rv.dashboard = self
+        layout = RecycleBoxLayout(orientation='vertical', size_hint_y=None,
+                                  default_size=(None, dp(40)), default_size_hint=(1, None))
+        layout.bind(minimum_height=layout.setter('height'))
+        self.rv.add_widget(layout)
+        self.add_widget(self.rv)
+
+        self.order = []       # App names in displayed order
+        self.rates = {}
+        self.latency = {}
+        self.destinations = {}  # app_name -> [(ip, host, rtt summary), ...]
+        self.popups = {}      # app_name -> AppGraphPopup
+        self.menu = None      # Created on first right-click
+        self.menu_app = None
         self.header.update_icons(self.sort_key, self.sort_desc)
 
     def change_sort(self, key):
         if self.sort_key == key: self.sort_desc = not self.sort_desc
         else: self.sort_key = key; self.sort_desc = True
         self.header.update_icons(self.sort_key, self.sort_desc)
+        self.update_apps(self.rates, self.latency)
 
-    def update_apps(self, rates):
-        current_apps = set(rates.keys())
-        existing_apps = set(self.rows.keys())
-        for app in existing_apps - current_apps:
-            self.rows_container.remove_widget(self.rows[app])
-            del self.rows[app]
-        
+    def update_apps(self, rates, latency=None, destinations=None):
+        self.rates = rates
+        if latency is not None: self.latency = latency
+        if destinations is not None: self.destinations = destinations
+        latency = self.latency
         data_list = list(rates.items())
         if self.sort_key == 'name': data_list.sort(key=lambda x: x[0].lower(), reverse=not self.sort_desc)
         elif self.sort_key == 'download': data_list.sort(key=lambda x: x[1][0], reverse=self.sort_desc)
         elif self.sort_key == 'upload': data_list.sort(key=lambda x: x[1][1], reverse=self.sort_desc)
-
-        self.rows_container.clear_widgets()
-        for app_name, (down, up) in data_list:
-            if app_name not in self.rows: self.rows[app_name] = AppRow(app_name)
-            self.rows[app_name].update_data(down, up)
-            self.rows_container.add_widget(self.rows[app_name])
+        elif self.sort_key == 'rtt':
+            # Apps without handshake samples go last either way
+            p50 = lambda x: latency.get(x[0], {}).get("p50")
+            measured = sorted((x for x in data_list if p50(x) is not None), key=p50, reverse=self.sort_desc)
+            data_list = measured + [x for x in data_list if p50(x) is None]
+
+        rows = [
+            {"app_name": app_name, "down_text": f"{down:.2f} KB/s", "up_text": f"{up:.2f} KB/s",
+             "rtt_text": _format_rtt(latency.get(app_name))}
+            for app_name, (down, up) in data_list
+        ]
+        order = [row["app_name"] for row in rows]
+        if order != self.order:
+            # Membership or sort order changed: replace the data in one go
+            self.order = order
+            self.rv.data = rows
+        else:
+            # Same order: only rows whose text changed are refreshed
+            data = self.rv.data
+            for i, row in enumerate(rows):
+                if data[i] != row: data[i] = row
+
+        for app_name, popup in self.popups.items():
+            if popup.parent and app_name in rates:
+                popup.update(*rates[app_name], self.destinations.get(app_name))
+
+    # --- Context menu (one shared DropDown, built lazily) ---
+    def open_menu(self, row):
+        if self.menu is None:
+            self.menu = DropDown(auto_width=False, width=dp(160))
+            def add_item(text, cb):
+                btn = Button(text=text, size_hint_y=None, height=dp(30), font_size="13sp")
+                btn.bind(on_release=lambda *_: (cb(self.menu_app), self.menu.dismiss()))
+                self.menu.add_widget(btn)
+            add_item("Show Graph", self.open_graph)
+            add_item("Close App", self.close_app)
+        self.menu_app = row.app_name
+        self.menu.open(row)
+
+    def open_graph(self, app_name):
+        popup = self.popups.get(app_name)
+        if popup is None: popup = self.popups[app_name] = AppGraphPopup(app_name)
+        popup.open()
+
+    def close_app(self, app_name):
+        kill_process_by_name(app_name)
 
 # =========================
 #   6. LOG VIEWER
 # =========================
-class LogRow(BoxLayout):
-    def __init__(self, log_entry, **kwargs):
+class LogRow(RecycleDataViewBehavior, BoxLayout):
+    """Recycled view for one log entry; text is formatted only when the row is shown."""
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.size_hint_y = None
         self.height = dp(30)
-        self.log_entry = log_entry 
-        ts = datetime.datetime.fromtimestamp(log_entry[0]).strftime('%H:%M:%S')
-        self.add_widget(Label(text=ts, size_hint_x=0.15))
+        self.log_entry = None
+        self.app_name = ""
+        self.viewer = None
+        self.lbl_ts = Label(size_hint_x=0.15)
+        self.lbl_app = Label(size_hint_x=0.25, shorten=True)
+        self.lbl_spd = Label(size_hint_x=0.2)
+        self.lbl_ips = Label(size_hint_x=0.4, font_size='11sp')
+        for lbl in (self.lbl_ts, self.lbl_app, self.lbl_spd, self.lbl_ips): self.add_widget(lbl)
+
+    def refresh_view_attrs(self, rv, index, data):
+        log_entry = data["log"]
+        if log_entry is self.log_entry: return
+        self.log_entry = log_entry
+        self.viewer = rv.viewer
         self.app_name = log_entry[1]
-        self.add_widget(Label(text=self.app_name, size_hint_x=0.25, shorten=True))
-        spd = f"D:{log_entry[2]:.1f} U:{log_entry[3]:.1f}"
-        self.add_widget(Label(text=spd, size_hint_x=0.2))
-        ips = f"{log_entry[4]} -> {log_entry[5]}"
-        self.add_widget(Label(text=ips, size_hint_x=0.4, font_size='11sp'))
-        self.dropdown = DropDown()
-        btn_loc = Button(text="Open Location", size_hint_y=None, height=dp(30))
-        btn_loc.bind(on_release=lambda x: (self.open_location(), self.dropdown.dismiss()))
-        self.dropdown.add_widget(btn_loc)
+        self.lbl_ts.text = datetime.datetime.fromtimestamp(log_entry[0]).strftime('%H:%M:%S')
+        self.lbl_app.text = self.app_name
+        self.lbl_spd.text = f"D:{log_entry[2]:.1f} U:{log_entry[3]:.1f}"
+        # Reverse-DNS names where known (rows from search_logs carry them after the id)
+        src_host, dst_host = log_entry[7:9] if len(log_entry) >= 9 else (None, None)
+        self.lbl_ips.text = f"{src_host or log_entry[4]} -> {dst_host or log_entry[5]}"
 
     def on_touch_down(self, touch):
         if self.collide_point(*touch.pos) and touch.button == "right":
-            self.dropdown.open(self)
+            if self.viewer: self.viewer.open_menu(self)
             return True
         return super().on_touch_down(touch)
 
-    def open_location(self):
-        exe_path = None
-        for proc in psutil.process_iter(['name', 'exe']):
-            try:
-                if proc.info['name'] == self.app_name:
-                    exe_path = proc.info['exe']
-                    break
-            except: pass
-        if exe_path and os.path.exists(exe_path):
-            if platform.system() == "Windows": subprocess.Popen(['explorer', '/select,', exe_path])
-            elif platform.system() == "Linux": subprocess.Popen(['xdg-open', os.path.dirname(exe_path)])
-        else: print(f"Path not found for {self.app_name}")
+def open_location(app_name):
+    exe_path = None
+    for info in registry.resolve(app_name):
+        if info.exe:
+            exe_path = info.exe
+            break
+    if exe_path and os.path.exists(exe_path):
+        if platform.system() == "Windows": subprocess.Popen(['explorer', '/select,', exe_path])
+        elif platform.system() == "Linux": subprocess.Popen(['xdg-open', os.path.dirname(exe_path)])
+    else: print(f"Path not found for {app_name}")
+
+LOG_TIME_RANGES = {"All time": None, "Last hour": 3600, "Last 24h": 86400, "Last 7 days": 7 * 86400}
+# One long-lived thread runs every log search, so the database keeps a single reader connection for them
+_search_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-search")
 
 class LogViewer(ModalView):
+    PAGE_SIZE = 500
+    SEARCH_DELAY = 0.3  # Seconds of typing pause before a search runs
+    PREFETCH_ROWS = 200  # Start loading the next page this close to the end
+
     def __init__(self, aggregator, **kwargs):
         super().__init__(**kwargs)
         self.aggregator = aggregator
         self.size_hint = (0.95, 0.9)
         self.current_logs = []
+        self.cursor = None
+        self.query_id = 0
+        self.active_filters = {}
+        self._loading = False
+        self._search_event = None
+        self.menu = None
+        self.menu_app = None
         layout = BoxLayout(orientation='vertical', padding=10)
         header = BoxLayout(size_hint_y=None, height=dp(40), spacing=10)
-        header.add_widget(Label(text="Instance Logs", bold=True, font_size='20sp', size_hint_x=0.3))
-        self.search_input = TextInput(hint_text="Search App Name...", size_hint_x=0.5, multiline=False)
+        header.add_widget(Label(text="Instance Logs", bold=True, font_size='20sp', size_hint_x=0.2))
+        self.search_input = TextInput(hint_text="Search App Name...", size_hint_x=0.3, multiline=False)
         self.search_input.bind(text=self.on_search)
         header.add_widget(self.search_input)
-        btn_close = Button(text="Close", size_hint_x=0.2)
+        self.ip_input = TextInput(hint_text="IP (or prefix*)", size_hint_x=0.2, multiline=False)
+        self.ip_input.bind(text=self.on_search)
+        header.add_widget(self.ip_input)
+        self.range_spinner = Spinner(text="All time", values=list(LOG_TIME_RANGES), size_hint_x=0.15)
+        self.range_spinner.bind(text=self.on_search)
+        header.add_widget(self.range_spinner)
+        btn_close = Button(text="Close", size_hint_x=0.15)
         btn_close.bind(on_release=self.dismiss)
         header.add_widget(btn_close)
         layout.add_widget(header)
@@ -414,28 +518,109 @@ class LogViewer(ModalView):
         btn_export = Button(text="Export to CSV", size_hint_x=None, width=120)
         btn_export.bind(on_release=self.export_csv)
         actions.add_widget(btn_export)
-        actions.add_widget(Label(text="")) 
+        self.status_label = Label(text="")
+        actions.add_widget(self.status_label)
         layout.add_widget(actions)
         headers = BoxLayout(size_hint_y=None, height=dp(30))
         headers.add_widget(Label(text="Time", size_hint_x=0.15, bold=True, color=[1,1,0,1]))
         headers.add_widget(Label(text="App", size_hint_x=0.25, bold=True, color=[1,1,0,1]))
         headers.add_widget(Label(text="Speed (KB/s)", size_hint_x=0.2, bold=True, color=[1,1,0,1]))
-        headers.add_widget(Label(text="Src -> Dst IP", size_hint_x=0.4, bold=True, color=[1,1,0,1]))
+        headers.add_widget(Label(text="Src -> Dst (host or IP)", size_hint_x=0.4, bold=True, color=[1,1,0,1]))
         layout.add_widget(headers)
-        self.scroll = ScrollView()
-        self.list_container = BoxLayout(orientation='vertical', size_hint_y=None)
-        self.list_container.bind(minimum_height=self.list_container.setter('height'))
-        self.scroll.add_widget(self.list_container)
-        layout.add_widget(self.scroll)
+        # Virtualized list: widget count stays constant however many rows are loaded
+        self.rv = RecycleView(do_scroll_x=False)
+        self.rv.viewclass = LogRow
+        self.rv.viewer = self
+        self.list_layout = RecycleBoxLayout(orientation='vertical', size_hint_y=None,
+                                            default_size=(None, dp(30)), default_size_hint=(1, None))
+        self.list_layout.bind(minimum_height=self.list_layout.setter('height'))
+        self.rv.add_widget(self.list_layout)
+        self.rv.bind(scroll_y=self.on_scroll)
+        layout.add_widget(self.rv)
         self.add_widget(layout)
         self.refresh_logs()
 
-    def on_search(self, instance, value): self.refresh_logs()
-    def refresh_logs(self, *args):
-        self.list_container.clear_widgets()
+    def on_search(self, instance, value):
+        # Debounce: restart the timer on every keystroke
+        if self._search_event: self._search_event.cancel()
+        self._search_event = Clock.schedule_once(self.refresh_logs, self.SEARCH_DELAY)
+
+    def _read_filters(self):
+        filters = {}
         search_text = self.search_input.text.strip()
-        self.current_logs = self.aggregator.get_logs(app_filter=search_text if search_text else None)
-        for log in self.current_logs: self.list_container.add_widget(LogRow(log))
+        if search_text: filters["app_filter"] = search_text
+        ip_text = self.ip_input.text.strip()
+        if ip_text: filters["ip"] = ip_text
+        window = LOG_TIME_RANGES.get(self.range_spinner.text)
+        if window: filters["start"] = time.time() - window
+        return filters
+
+    def refresh_logs(self, *args):
+        self.query_id += 1
+        self.rv.data = []
+        self.rv.scroll_y = 1
+        self.current_logs = []
+        self.cursor = None
+        self.active_filters = self._read_filters()
+        self._run_query(self.query_id, None)
+
+    def load_more(self, *args):
+        if self.cursor is None or self._loading: return
+        self._run_query(self.query_id, self.cursor)
+
+    def on_scroll(self, rv, scroll_y):
+        # Stream the next page in when the user nears the end of what's loaded
+        hidden = self.list_layout.height - rv.height
+        if hidden <= 0: return
+        rows_below = scroll_y * hidden / dp(30)
+        if rows_below < self.PREFETCH_ROWS: self.load_more()
+
+    def _run_query(self, query_id, cursor):
+        # SQLite work happens off the UI thread; results come back through the Clock
+        self._loading = True
+        self.status_label.text = "Loading..."
+        filters = dict(self.active_filters)
+        _search_worker.submit(self._query_worker, query_id, filters, cursor)
+
+    def _query_worker(self, query_id, filters, cursor):
+        if query_id != self.query_id:
+            return  # Superseded while queued behind another search
+        try:
+            rows, next_cursor = self.aggregator.search_logs(cursor=cursor, limit=self.PAGE_SIZE, **filters)
+        except Exception as e:
+            print(f"Log Search Error: {e}")
+            rows, next_cursor = [], None
+        Clock.schedule_once(lambda dt: self._show_page(query_id, rows, next_cursor))
+
+    def _show_page(self, query_id, rows, next_cursor):
+        if query_id != self.query_id: return  # Superseded by a newer search
+        self._loading = False
+        self.cursor = next_cursor
+        self.current_logs.extend(rows)
+        self._keep_scroll_position()
+        self.rv.data.extend({"log": log} for log in rows)
+        more = " (scroll for more)" if next_cursor else ""
+        self.status_label.text = f"{len(self.current_logs)} rows{more}"
+
+    def _keep_scroll_position(self):
+        # scroll_y is relative, so growing the list would otherwise move the view
+        hidden = self.list_layout.height - self.rv.height
+        if hidden <= 0: return
+        offset = (1 - self.rv.scroll_y) * hidden
+        def restore(layout, height):
+            layout.unbind(height=restore)
+            new_hidden = height - self.rv.height
+            if new_hidden > 0: self.rv.scroll_y = max(0, 1 - offset / new_hidden)
+        self.list_layout.bind(height=restore)
+
+    def open_menu(self, row):
+        if self.menu is None:
+            self.menu = DropDown()
+            btn_loc = Button(text="Open Location", size_hint_y=None, height=dp(30))
+            btn_loc.bind(on_release=lambda x: (open_location(self.menu_app), self.menu.dismiss()))
+            self.menu.add_widget(btn_loc)
+        self.menu_app = row.app_name
+        self.menu.open(row)
 
     def export_csv(self, *args):
         if not self.current_logs: return
@@ -443,13 +628,13 @@ class LogViewer(ModalView):
         try:
             with open(filename, 'w', newline='') as f:
                 writer = csv.writer(f)
-                writer.writerow(["Timestamp", "App Name", "Download (KB/s)", "Upload (KB/s)", "Src IP", "Dst IP"])
+                writer.writerow(["Timestamp", "App Name", "Download (KB/s)", "Upload (KB/s)", "Src IP", "Dst IP",
+                                 "Src Host", "Dst Host"])
                 for log in self.current_logs:
                     ts_str = datetime.datetime.fromtimestamp(log[0]).strftime('%Y-%m-%d %H:%M:%S')
-                    writer.writerow([ts_str, log[1], log[2], log[3], log[4], log[5]])
+                    writer.writerow([ts_str, log[1], log[2], log[3], log[4], log[5], log[7] or "", log[8] or ""])
             print(f"Exported to {filename}")
             original_text = args[0].text
             args[0].text = "Saved!"
-            from kivy.clock import Clock
             Clock.schedule_once(lambda dt: setattr(args[0], 'text', original_text), 2)
         except Exception as e: print(f"Export Error: {e}")
\ No newline at end of file